@@ -3,8 +3,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
+from app.replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login = LoginManager()
 login.login_view = 'auth.login'
@@ -13,16 +14,53 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app import engine, replicas, conditional
+    engine.configure(app)
+    replicas.configure(app)
     db.init_app(app)
+    engine.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
 
+    # Each app gets its own instance of these, in app.extensions; the
+    # module-level names (metrics, blob_store, ...) find the current app's
+    from app.metrics import Metrics
+    Metrics(app)
+
+    from app.blobs import BlobStore
+    BlobStore(app)
+
+    from app.cache import AIResponseCache
+    AIResponseCache(app)
+
+    from app.resilience import CircuitBreaker
+    CircuitBreaker(app)
+
+    from app.search import SearchIndex
+    SearchIndex(app)
+
+    from app.facets import CategoryFacetCache
+    CategoryFacetCache(app)
+
+    from app.fragments import FragmentCache
+    FragmentCache(app)
+    conditional.init_app(app)
+
+    from app.events import ActionBuffer
+    ActionBuffer(app)
+
+    from app.tasks import Categorizer
+    Categorizer(app)
+
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
 
     from app import routes, models
     app.register_blueprint(routes.bp)
 
+    from app import cli
+    cli.init_app(app)
+
     from flask import render_template
     @app.errorhandler(403)
     def forbidden_error(error):
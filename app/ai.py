@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+import httpx
+from flask import current_app, has_request_context, request
+from app.cache import ai_cache, cache_key
+from app.metrics import track
+from app.resilience import CircuitOpenError, breaker, call_with_retries, record_attempt
+
+# Declarative model registry: every OpenAI-compatible provider we support and
+# the chat model used for it unless AI_MODEL overrides it.
+PROVIDERS = {
+    'openai': {'model': 'gpt-3.5-turbo'},
+    'grok': {'model': 'grok-2-1212'},
+    'groq': {'model': 'llama-3.3-70b-versatile'},
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def create_client(api_key, base_url=None, timeout=60.0, max_connections=20,
+                  max_keepalive_connections=10, keepalive_expiry=30.0, max_retries=2):
+    """Build an OpenAI client on a pooled, keep-alive httpx transport."""
+    from openai import OpenAI
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_keepalive_connections,
+                            keepalive_expiry=keepalive_expiry),
+        timeout=httpx.Timeout(timeout, connect=5.0),
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                  max_retries=max_retries)
+
+
+def is_configured():
+    config = current_app.config
+    return bool(config.get('AI_API_KEY')) and config.get('AI_PROVIDER') in PROVIDERS
+
+
+def get_model():
+    return current_app.config.get('AI_MODEL') or PROVIDERS[current_app.config.get('AI_PROVIDER')]['model']
+
+
+def get_client():
+    # One long-lived client per provider/credentials, per process: connection
+    # pools must not be shared across a fork
+    config = current_app.config
+    key = (config.get('AI_PROVIDER'), config.get('AI_API_KEY'), config.get('AI_BASE_URL'), os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = create_client(
+                    config.get('AI_API_KEY'), config.get('AI_BASE_URL'),
+                    timeout=config['AI_TIMEOUT'],
+                    max_connections=config['AI_MAX_CONNECTIONS'],
+                    max_keepalive_connections=config['AI_MAX_KEEPALIVE_CONNECTIONS'],
+                    keepalive_expiry=config['AI_KEEPALIVE_EXPIRY'],
+                    # Retries happen in call_with_retries, within the caller's deadline
+                    max_retries=0,
+                )
+                _clients[key] = client
+    return client
+
+
+def get_deadline():
+    # Per endpoint where configured, so that a slow provider cannot hold a
+    # worker past its own timeout
+    config = current_app.config
+    endpoint = request.endpoint if has_request_context() else None
+    return config['AI_DEADLINES'].get(endpoint, config['AI_DEADLINE'])
+
+
+def complete(prompt, json_mode=False, deadline=None, retries=None, cache=False):
+    """Send a single-message chat completion and return the reply text.
+
+    deadline is the time in seconds allowed for all attempts together (by
+    default the endpoint's); retries defaults to AI_MAX_RETRIES. Raises
+    CircuitOpenError at once while the circuit breaker is open.
+
+    With cache=True the reply is looked up in and stored to the AI response
+    cache; only use it for prompts whose answer may be reused for identical input.
+    """
+    key = None
+    if cache:
+        key = cache_key(prompt, current_app.config.get('AI_PROVIDER'), get_model(), json_mode)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+
+    options = {}
+    if json_mode:
+        options['response_format'] = {"type": "json_object"}
+
+    def attempt(timeout):
+        return get_client().chat.completions.create(
+            model=get_model(),
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+            **options
+        )
+
+    with track('ai'):
+        response = call_with_retries(attempt, deadline or get_deadline(), retries)
+    content = response.choices[0].message.content
+
+    if key is not None and content:
+        if json_mode:
+            # Don't pin a malformed reply in the cache; this raises like the caller's parse would
+            json.loads(content)
+        ai_cache.set(key, content, current_app.config.get('AI_PROVIDER'), get_model())
+    return content
+
+
+def stream(prompt, deadline=None):
+    """Yield the reply to a single-message chat completion as it is generated.
+
+    Opening the stream is retried like complete(); once text has been
+    yielded a failure is raised instead, and so is TimeoutError when the
+    whole reply takes longer than deadline.
+    """
+    deadline = deadline or get_deadline()
+    expires_at = time.monotonic() + deadline
+
+    def attempt(timeout):
+        return get_client().chat.completions.create(
+            model=get_model(),
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            timeout=timeout,
+        )
+
+    # Until the stream ends; that is usually after the response headers went out
+    with track('ai'):
+        response = call_with_retries(attempt, deadline)
+        started = time.monotonic()
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if time.monotonic() > expires_at:
+                    raise TimeoutError(f'AI reply took longer than {deadline:g}s')
+        except Exception as e:
+            record_attempt(started, e)
+            raise
+        finally:
+            # Also runs on GeneratorExit, releasing the upstream connection early
+            response.close()
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MODEL = 'stub'
+STUB_CATEGORIES = ['Career', 'Personal Finance', 'Health', 'Education', 'Travel', 'Shopping', 'Technology']
+WORDS = '''
+    consider the tradeoff between short term cost and long term value before you commit and
+    write down what would change your mind then test the riskiest assumption first with a small
+    pilot ask someone who made a similar choice and compare at least three real options
+'''.split()
+TOKEN_RE = re.compile(r'\S+\s*')
+
+
+def parse_latency(spec):
+    """A sampler of delays in seconds from a spec in milliseconds: '250'
+    (fixed), 'uniform:100,500', 'normal:300,50' (mean, sd),
+    'lognormal:300,0.5' (median, sigma) or 'exponential:300' (mean)."""
+    kind, _, args = spec.rpartition(':')
+    try:
+        values = [float(value) for value in args.split(',')]
+    except ValueError:
+        raise ValueError(f'invalid latency {spec!r}')
+    samplers = {
+        ('', 1): lambda rng: values[0],
+        ('fixed', 1): lambda rng: values[0],
+        ('uniform', 2): lambda rng: rng.uniform(*values),
+        ('normal', 2): lambda rng: rng.gauss(*values),
+        ('lognormal', 2): lambda rng: values[0] * rng.lognormvariate(0, values[1]),
+        ('exponential', 1): lambda rng: rng.expovariate(1 / values[0]) if values[0] else 0.0,
+    }
+    sampler = samplers.get((kind, len(values)))
+    if sampler is None:
+        raise ValueError(f'invalid latency {spec!r}')
+    return lambda rng: max(0.0, sampler(rng)) / 1000
+
+
+def _words(seed, count):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def canned_reply(prompt, json_mode, reply_words=120):
+    """A plausible answer to each of the app's prompts, the same for the same prompt."""
+    digest = hashlib.sha1(prompt.encode()).hexdigest()
+    if 'Categorize the following decision' in prompt:
+        return STUB_CATEGORIES[int(digest, 16) % len(STUB_CATEGORIES)]
+    if '"suggestions"' in prompt:
+        return json.dumps({'suggestions': [
+            {'title': f'Option {n + 1}: {_words(digest + str(n), 3)}',
+             'description': _words(digest + 'd' + str(n), 20),
+             'pros': _words(digest + 'p' + str(n), 8), 'cons': _words(digest + 'c' + str(n), 8)}
+            for n in range(3)]})
+    if '"description"' in prompt and '"pros"' in prompt:
+        return json.dumps({'description': _words(digest + 'd', 30), 'pros': _words(digest + 'p', 10),
+                           'cons': _words(digest + 'c', 10)})
+    if json_mode:
+        return json.dumps({'reply': _words(digest, reply_words)})
+    words = _words(digest, reply_words).split()
+    paragraphs = [' '.join(words[start:start + 40]) for start in range(0, len(words), 40)]
+    return ''.join(f'<p>{paragraph.capitalize()}.</p>' for paragraph in paragraphs)
+
+
+class StubBehaviour:
+    """How the stub answers: its latency, speed, failures and replies.
+
+    Each request first waits for a latency sample (time to first token),
+    then produces its reply at tokens_per_second (0 for all at once). With
+    the given probabilities it instead fails with one of error_statuses,
+    hangs for hang_seconds before answering (to trip client timeouts), or,
+    when streaming, drops the connection part-way through.
+
+    Replies are 'canned' (a plausible answer to each of the app's prompts)
+    or 'echo' (the prompt itself). responses, [(regex, reply)], are tried
+    against the prompt first.
+    """
+
+    def __init__(self, latency='0', tokens_per_second=0.0, error_rate=0.0, error_statuses=(500,),
+                 hang_rate=0.0, hang_seconds=120.0, drop_rate=0.0, mode='canned', responses=(),
+                 reply_words=120, seed=None):
+        self.latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.drop_rate = drop_rate
+        self.mode = mode
+        self.responses = [(re.compile(pattern), reply) for pattern, reply in responses]
+        self.reply_words = reply_words
+        self.stats = {'requests': 0, 'errors': 0, 'hangs': 0, 'drops': 0}
+        # The handlers run in threads and share one seeded generator
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self):
+        with self._lock:
+            return self.latency(self._rng)
+
+    def happens(self, rate):
+        with self._lock:
+            return self._rng.random() < rate
+
+    def error_status(self):
+        with self._lock:
+            return self._rng.choice(self.error_statuses)
+
+    def drop_point(self, tokens):
+        with self._lock:
+            return self._rng.randrange(tokens) if self._rng.random() < self.drop_rate else None
+
+    def count(self, what):
+        with self._lock:
+            self.stats[what] += 1
+
+    def reply(self, prompt, json_mode):
+        for pattern, reply in self.responses:
+            if pattern.search(prompt):
+                return reply
+        if self.mode == 'echo':
+            return json.dumps({'echo': prompt}) if json_mode else prompt
+        return canned_reply(prompt, json_mode, self.reply_words)
+
+    def pace(self, tokens):
+        if self.tokens_per_second:
+            time.sleep(tokens / self.tokens_per_second)
+
+
+def _prompt(messages):
+    # The last user message; content may be a string or a list of parts
+    for message in reversed(messages or []):
+        if message.get('role') == 'user':
+            content = message.get('content') or ''
+            if isinstance(content, list):
+                content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+            return content
+    return ''
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AIStub/1.0'
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self._send_json(200, {'object': 'list', 'data': [
+                {'id': STUB_MODEL, 'object': 'model', 'created': 0, 'owned_by': 'stub'}]})
+        self._send_error(404, f'Unknown path {self.path}', 'not_found')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_error(400, 'Request body is not JSON', 'invalid_request_error')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_error(404, f'Unknown path {self.path}', 'not_found')
+
+        behaviour = self.server.behaviour
+        behaviour.count('requests')
+        time.sleep(behaviour.sample_latency())
+        if behaviour.happens(behaviour.hang_rate):
+            behaviour.count('hangs')
+            time.sleep(behaviour.hang_seconds)
+        if behaviour.happens(behaviour.error_rate):
+            behaviour.count('errors')
+            status = behaviour.error_status()
+            return self._send_error(status, f'Injected upstream failure ({status})', 'stub_error',
+                                    headers={'Retry-After': '1'} if status == 429 else None)
+
+        json_mode = (body.get('response_format') or {}).get('type') == 'json_object'
+        prompt = _prompt(body.get('messages'))
+        content = behaviour.reply(prompt, json_mode)
+        model = body.get('model') or STUB_MODEL
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        tokens = TOKEN_RE.findall(content) or ['']
+        if body.get('stream'):
+            return self._stream(behaviour, completion_id, model, tokens)
+
+        behaviour.pace(len(tokens))
+        self._send_json(200, {
+            'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(TOKEN_RE.findall(prompt)), 'completion_tokens': len(tokens),
+                      'total_tokens': len(TOKEN_RE.findall(prompt)) + len(tokens)},
+        })
+
+    def _stream(self, behaviour, completion_id, model, tokens):
+        # No Content-Length, so the connection ends with the stream
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        drop_at = behaviour.drop_point(len(tokens))
+
+        def event(delta, finish_reason=None):
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+
+        try:
+            event({'role': 'assistant', 'content': ''})
+            for index, token in enumerate(tokens):
+                if index == drop_at:
+                    behaviour.count('drops')
+                    return
+                behaviour.pace(1)
+                event({'content': token})
+            event({}, 'stop')
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, error_type, headers=None):
+        self._send_json(status, {'error': {'message': message, 'type': error_type, 'code': status}}, headers)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_stub_server(behaviour, host='127.0.0.1', port=8808, quiet=False):
+    """An OpenAI-compatible chat.completions server; serve_forever() runs it.
+    Clients use http://host:port/v1 as their base URL, with any API key."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.behaviour = behaviour
+    server.quiet = quiet
+    return server
+
+
+def start_stub_server(behaviour, host='127.0.0.1', port=0, quiet=True):
+    """Run a stub server in a background thread; port 0 picks a free port.
+    Returns the server and its base URL. Stop it with server.shutdown()."""
+    server = make_stub_server(behaviour, host, port, quiet)
+    threading.Thread(target=server.serve_forever, name='ai-stub', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/v1'
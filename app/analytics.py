@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Decision, UserAction, UserActivityDaily, DecisionActivityDaily
+
+COUNTED_ACTIONS = {
+    'asked': 'asked',
+    'read': 'read',
+    'clarification': 'clarifications',
+    'suggestion': 'suggestions',
+}
+INTERACTION_ACTIONS = ['suggestion', 'clarification']
+HIGH_INTERACTION_THRESHOLD = 3  # Threshold for "a lot"
+
+
+def _empty_stats():
+    stats = dict.fromkeys(COUNTED_ACTIONS.values(), 0)
+    stats['high_interaction'] = 0
+    stats['top_categories'] = []
+    return stats
+
+
+def action_counts(user_ids):
+    rows = db.session.execute(
+        db.select(UserActivityDaily.user_id, UserActivityDaily.action_type,
+                  db.func.sum(UserActivityDaily.count))
+        .where(UserActivityDaily.user_id.in_(user_ids),
+               UserActivityDaily.action_type.in_(list(COUNTED_ACTIONS)))
+        .group_by(UserActivityDaily.user_id, UserActivityDaily.action_type)
+    )
+    return [(user_id, COUNTED_ACTIONS[action_type], count) for user_id, action_type, count in rows]
+
+
+def high_interaction_counts(user_ids):
+    # Decisions owned by these users that had more than the threshold of
+    # suggestions and clarifications from others
+    owned = db.select(Decision.id).where(Decision.user_id.in_(user_ids))
+    busy = (
+        db.select(DecisionActivityDaily.decision_id)
+        .where(DecisionActivityDaily.decision_id.in_(owned),
+               DecisionActivityDaily.action_type.in_(INTERACTION_ACTIONS))
+        .group_by(DecisionActivityDaily.decision_id)
+        .having(db.func.sum(DecisionActivityDaily.count) > HIGH_INTERACTION_THRESHOLD)
+        .subquery()
+    )
+    return db.session.execute(
+        db.select(Decision.user_id, db.func.count(Decision.id))
+        .join(busy, busy.c.decision_id == Decision.id)
+        .where(Decision.user_id.in_(user_ids))
+        .group_by(Decision.user_id)
+    ).all()
+
+
+def top_categories(user_ids, limit=3):
+    # Rank each user's categories by interaction count in one pass with a window function.
+    # The rollups have no category dimension (categories change after the fact), so this
+    # one still reads the log, restricted to the users on the page.
+    interaction_count = db.func.count(UserAction.id)
+    ranked = (
+        db.select(
+            UserAction.user_id,
+            Decision.category,
+            interaction_count.label('count'),
+            db.func.row_number().over(
+                partition_by=UserAction.user_id,
+                order_by=(interaction_count.desc(), Decision.category)
+            ).label('rank')
+        )
+        .join(Decision, UserAction.decision_id == Decision.id)
+        .where(UserAction.user_id.in_(user_ids))
+        .group_by(UserAction.user_id, Decision.category)
+        .subquery()
+    )
+    return db.session.execute(
+        db.select(ranked.c.user_id, ranked.c.category)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.user_id, ranked.c.rank)
+    ).all()
+
+
+def admin_user_stats(user_ids):
+    """Dashboard stats for a page of users, computed with a fixed number of
+    grouped queries however many users and decisions there are."""
+    user_stats = {user_id: _empty_stats() for user_id in user_ids}
+    if not user_stats:
+        return user_stats
+    ids = list(user_stats)
+
+    for user_id, key, count in action_counts(ids):
+        user_stats[user_id][key] = count
+    for user_id, count in high_interaction_counts(ids):
+        user_stats[user_id]['high_interaction'] = count
+    for user_id, category in top_categories(ids):
+        if category:
+            user_stats[user_id]['top_categories'].append(category)
+    return user_stats
+
+
+ROLLUPS = (
+    (UserActivityDaily, 'user_id'),
+    (DecisionActivityDaily, 'decision_id'),
+)
+
+
+def increment_rollup(connection, model, rows):
+    table = model.__table__
+    keys = [column.name for column in table.primary_key.columns]
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=keys,
+                                          set_={'count': table.c.count + stmt.excluded.count})
+        connection.execute(stmt, rows)
+        return
+    for row in rows:
+        key_filter = db.and_(*[table.c[key] == row[key] for key in keys])
+        result = connection.execute(table.update().where(key_filter)
+                                    .values(count=table.c.count + row['count']))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+@event.listens_for(Session, 'after_flush')
+def update_activity_rollups(session, flush_context):
+    # Keep the daily rollups in step with UserAction inserts, in the same transaction
+    actions = [obj for obj in session.new if isinstance(obj, UserAction) and obj.action_type]
+    if not actions:
+        return
+    connection = session.connection()
+    for model, key in ROLLUPS:
+        increments = Counter(
+            (getattr(action, key), action.action_type, (action.timestamp or datetime.utcnow()).date())
+            for action in actions if getattr(action, key) is not None
+        )
+        if increments:
+            increment_rollup(connection, model, [
+                {key: key_value, 'action_type': action_type, 'day': day, 'count': count}
+                for (key_value, action_type, day), count in increments.items()
+            ])
+
+
+def rebuild_activity_rollups():
+    """Recompute both rollup tables from the raw UserAction log."""
+    day = db.func.date(UserAction.timestamp)
+    for model, key in ROLLUPS:
+        key_column = getattr(UserAction, key)
+        db.session.execute(db.delete(model))
+        db.session.execute(
+            db.insert(model).from_select(
+                [key, 'action_type', 'day', 'count'],
+                db.select(key_column, UserAction.action_type, day, db.func.count(UserAction.id))
+                .where(key_column.isnot(None), UserAction.action_type.isnot(None),
+                       UserAction.timestamp.isnot(None))
+                .group_by(key_column, UserAction.action_type, day)
+            )
+        )
+    db.session.commit()
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+BLOB_URL_PREFIX = '/blobs/'
+
+# Raster formats only: SVG can carry script, so it is left inline
+IMAGE_TYPES = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+MIME_TYPES = {ext: mimetype for mimetype, ext in IMAGE_TYPES.items()}
+
+DATA_URI_RE = re.compile(
+    r'data:(?P<mimetype>image/(?:png|jpeg|gif|webp));base64,(?P<data>[A-Za-z0-9+/=\s]+)', re.IGNORECASE)
+BLOB_URL_RE = re.compile(re.escape(BLOB_URL_PREFIX) + r'(?P<digest>[0-9a-f]{64})\.(?P<ext>png|jpg|gif|webp)')
+
+
+class BlobStore:
+    """Content-addressed file store for images pasted into rich-text fields.
+
+    Blobs live under BLOB_STORE_PATH as <digest[:2]>/<digest>.<ext>, where
+    digest is the SHA-256 of the bytes, so identical images are stored once
+    and a blob never changes once written.
+    """
+
+    def __init__(self, app=None, root=None):
+        self.root = root
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config.get('BLOB_STORE_PATH') or os.path.join(app.instance_path, 'blobs')
+        app.extensions['blob_store'] = self
+
+    def path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], f'{digest}.{ext}')
+
+    def put(self, data, ext):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # mkstemp makes it 0600; a front-end server must be able to read it
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest, ext):
+        with open(self.path(digest, ext), 'rb') as f:
+            return f.read()
+
+    def extract_images(self, html):
+        """Replace inline base64 images in html with blob URLs."""
+        if not html or 'base64,' not in html:
+            return html
+
+        def replace(match):
+            try:
+                data = base64.b64decode(re.sub(r'\s+', '', match.group('data')), validate=True)
+            except (binascii.Error, ValueError):
+                return match.group(0)
+            ext = IMAGE_TYPES[match.group('mimetype').lower()]
+            return f'{BLOB_URL_PREFIX}{self.put(data, ext)}.{ext}'
+
+        return DATA_URI_RE.sub(replace, html)
+
+    def inline_images(self, html):
+        """Reverse of extract_images: turn blob URLs back into data URIs."""
+        if not html or BLOB_URL_PREFIX not in html:
+            return html
+
+        def replace(match):
+            digest, ext = match.group('digest'), match.group('ext')
+            try:
+                data = self.get(digest, ext)
+            except FileNotFoundError:
+                return match.group(0)
+            return f'data:{MIME_TYPES[ext]};base64,{base64.b64encode(data).decode()}'
+
+        return BLOB_URL_RE.sub(replace, html)
+
+
+# The current app's BlobStore; create_app gives every app its own
+blob_store = LocalProxy(lambda: current_app.extensions['blob_store'])
+
+
+def extract_inline_images(html):
+    return blob_store.extract_images(html)
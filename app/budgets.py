@@ -0,0 +1,272 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from flask import has_request_context
+from flask_migrate import upgrade
+from sqlalchemy import event
+from app import create_app, db
+from app.blobs import blob_store
+from app.loadtest import image_pool, seed_dataset, stage_html
+from app.models import User, Decision, Option, Suggestion, Clarification, StageSuggestion
+from config import Config
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+BUDGET_PASSWORD = 'budget-password'
+DECISION_FORM = {'title': 'Budget decision, edited', 'stage': '2_framing', 'is_public': 'y',
+                 'stage_1_trigger': '<p>What started it.</p>', 'stage_2_framing': '<p>What is decided.</p>'}
+PROFILE_FORM = {'username': 'budget_other', 'email': 'budget_other@example.com',
+                'headline': 'Edited headline', 'about': 'About me.', 'skills': 'planning, budgets'}
+
+# One request per case, made in order against a freshly seeded database: the
+# endpoint, who asks, the request, the status it must get, and the most SQL
+# statements and milliseconds it may take. Query budgets are the same at
+# every dataset size, so a query per row (N+1) fails at the larger sizes.
+# Paths and form values are filled in from the fixtures; see _create_fixtures.
+Case = namedtuple('Case', 'endpoint viewer method path status queries ms data json', defaults=(None, None))
+
+CASES = [
+    # Reads
+    Case('main.index', 'anonymous', 'GET', '/', 200, 2, 100),
+    Case('main.index', 'owner', 'GET', '/index', 200, 5, 100),
+    Case('main.decision_feed', 'owner', 'GET', '/decisions/feed?scope=public', 200, 2, 100),
+    Case('main.search', 'owner', 'GET', '/search?q=budget', 200, 3, 100),
+    Case('main.view_decision', 'anonymous', 'GET', '/decision/{decision}', 200, 4, 100),
+    Case('main.view_decision', 'owner', 'GET', '/decision/{decision}', 200, 16, 100),
+    Case('main.category_status', 'owner', 'GET', '/decision/{decision}/category_status', 200, 1, 100),
+    Case('main.blob', 'anonymous', 'GET', '{blob}', 200, 0, 100),
+    Case('main.user', 'anonymous', 'GET', '/user/budget_owner', 200, 3, 100),
+    Case('main.new_decision', 'owner', 'GET', '/decision/new', 200, 1, 100),
+    Case('main.edit_decision', 'owner', 'GET', '/decision/{decision}/edit', 200, 3, 100),
+    Case('main.edit_option', 'owner', 'GET', '/option/{option}/edit', 200, 3, 100),
+    Case('main.edit_profile', 'other', 'GET', '/edit_profile', 200, 1, 100),
+    Case('main.suggest_options', 'owner', 'GET', '/decision/{decision}/suggest_options', 200, 2, 100),
+    Case('main.admin', 'admin', 'GET', '/admin', 200, 8, 300),
+    Case('main.admin_edit_user', 'admin', 'GET', '/admin/user/{other}/edit', 200, 2, 100),
+    Case('main.prometheus_metrics', 'admin', 'GET', '/metrics', 200, 1, 100),
+    Case('auth.login', 'anonymous', 'GET', '/auth/login', 200, 0, 100),
+    Case('auth.register', 'anonymous', 'GET', '/auth/register', 200, 0, 100),
+    # Writes
+    Case('main.update_stage_content', 'owner', 'POST', '/decision/{decision}/update_stage_content', 200, 11, 100,
+         json={'stage_key': '3_objectives', 'content': '<p>Updated objectives.</p>'}),
+    Case('main.suggest_stage_content', 'other', 'POST', '/decision/{decision}/suggest_stage_content', 200, 8, 100,
+         json={'stage_key': '4_options', 'content': '<p>Another option.</p>'}),
+    Case('main.set_current_stage', 'owner', 'POST', '/decision/{decision}/set_current_stage', 302, 4, 100,
+         data={'stage_key': '5_information'}),
+    Case('main.ai_assist_stage', 'owner', 'POST', '/decision/{decision}/ai_assist_stage', 501, 3, 100,
+         json={'stage_key': '1_trigger', 'content': ''}),
+    Case('main.ai_assist_stage_stream', 'owner', 'POST', '/decision/{decision}/ai_assist_stage/stream', 501, 2, 100,
+         json={'stage_key': '1_trigger', 'content': ''}),
+    Case('main.refine_option', 'owner', 'POST', '/decision/{decision}/refine_option', 200, 2, 100,
+         json={'title': 'Wait a year'}),
+    Case('main.add_option', 'owner', 'POST', '/decision/{decision}/add_option', 302, 10, 100,
+         data={'title': 'Budget option', 'description': 'Described.', 'pros': 'Cheap.', 'cons': 'Slow.'}),
+    Case('main.edit_option', 'owner', 'POST', '/option/{option}/edit', 302, 12, 100,
+         data={'title': 'Budget option, edited', 'description': 'Described again.'}),
+    Case('main.delete_option', 'owner', 'POST', '/option/{doomed_option}/delete', 302, 11, 100),
+    Case('main.add_suggestion', 'other', 'POST', '/decision/{decision}/add_suggestion', 302, 16, 100,
+         data={'title': 'Ask a mentor', 'description': 'Someone who did it.'}),
+    Case('main.accept_suggestion', 'owner', 'POST', '/suggestion/{suggestion}/accept', 302, 13, 100),
+    Case('main.ignore_suggestion', 'owner', 'POST', '/suggestion/{ignored_suggestion}/ignore', 302, 6, 100),
+    Case('main.add_clarification', 'other', 'POST', '/decision/{decision}/add_clarification', 302, 10, 100,
+         data={'message': 'What is the budget?'}),
+    Case('main.apply_clarification', 'owner', 'POST', '/clarification/{clarification}/apply', 302, 6, 100),
+    Case('main.ignore_clarification', 'owner', 'POST', '/clarification/{ignored_clarification}/ignore',
+         302, 6, 100),
+    Case('main.accept_stage_suggestion', 'owner', 'POST', '/stage_suggestion/{stage_suggestion}/accept',
+         302, 15, 100),
+    Case('main.ignore_stage_suggestion', 'owner', 'POST', '/stage_suggestion/{ignored_stage_suggestion}/ignore',
+         302, 6, 100),
+    Case('main.edit_decision', 'owner', 'POST', '/decision/{decision}/edit', 302, 21, 100, data=DECISION_FORM),
+    Case('main.new_decision', 'owner', 'POST', '/decision/new', 302, 17, 100,
+         data={'title': 'A new budget decision', 'stage': '1_trigger', 'is_public': 'y',
+               'stage_1_trigger': '<p>It started.</p>'}),
+    Case('main.edit_profile', 'other', 'POST', '/edit_profile', 302, 3, 150, data=PROFILE_FORM),
+    Case('main.admin_edit_user', 'admin', 'POST', '/admin/user/{doomed}/edit', 302, 5, 100,
+         data={'username': 'budget_doomed_edited', 'email': 'budget_doomed@example.com'}),
+    Case('main.delete_decision', 'owner', 'POST', '/decision/{doomed_decision}/delete', 302, 18, 150),
+    Case('main.bulk_delete_decisions', 'admin', 'POST', '/admin/decisions/bulk_delete', 302, 13, 100,
+         data={'decision_ids': ['{bulk_decision_1}', '{bulk_decision_2}']}),
+    Case('main.admin_delete_user', 'admin', 'POST', '/admin/user/{doomed}/delete', 302, 10, 100),
+    Case('main.bulk_delete_users', 'admin', 'POST', '/admin/users/bulk_delete', 302, 8, 100,
+         data={'user_ids': ['{bulk_doomed}']}),
+    Case('main.deploy_webhook', 'anonymous', 'POST', '/deploy-webhook', 401, 0, 100),
+    Case('main.deploy_webhook_root', 'anonymous', 'POST', '/', 401, 0, 100),
+    Case('auth.register', 'anonymous', 'POST', '/auth/register', 302, 3, 500,
+         data={'username': 'budget_new', 'email': 'budget_new@example.com',
+               'password': BUDGET_PASSWORD, 'password2': BUDGET_PASSWORD}),
+    Case('auth.login', 'anonymous', 'POST', '/auth/login', 302, 1, 500,
+         data={'username': 'budget_other', 'password': BUDGET_PASSWORD}),
+    Case('auth.logout', 'other', 'GET', '/auth/logout', 302, 1, 100),
+]
+
+
+def budget_config(directory):
+    """Config for a scratch app in directory: nothing outside it is touched,
+    and nothing leaves the process."""
+    return type('BudgetConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'budget.db'),
+        'SQLALCHEMY_BINDS': {},
+        'SQLALCHEMY_REPLICA_URIS': [],
+        'BLOB_STORE_PATH': os.path.join(directory, 'blobs'),
+        'AI_API_KEY': None,
+        'WTF_CSRF_ENABLED': False,
+        # Set, so the deploy webhook rejects the token instead of pulling
+        'WEBHOOK_SECRET': os.urandom(16).hex(),
+    })
+
+
+def _create_fixtures():
+    # Rows every case can rely on, whatever the seeded data looks like
+    rng = random.Random('budget')
+    users = {}
+    for name in ('owner', 'other', 'admin', 'doomed', 'bulk_doomed'):
+        users[name] = User(username=f'budget_{name}', email=f'budget_{name}@example.invalid',
+                           is_admin=name == 'admin')
+        users[name].set_password(BUDGET_PASSWORD)
+    decision = Decision(title='Budget decision', owner=users['owner'], category='Career', is_public=True)
+    for stage_key, _ in Decision.STAGES:
+        decision.set_stage_content(stage_key, stage_html(rng))
+    options = [Option(title=f'Option {n}', description=stage_html(rng), decision=decision) for n in range(5)]
+    suggestions = [Suggestion(title=f'Suggestion {n}', description='Try this.', decision=decision,
+                              author=users['other']) for n in range(3)]
+    clarifications = [Clarification(message=f'Please clarify point {n}.', decision=decision,
+                                    author=users['other']) for n in range(3)]
+    stage_suggestions = [StageSuggestion(stage_key='1_trigger', content='<p>More context.</p>', decision=decision,
+                                         author=users['other']) for n in range(3)]
+    doomed = [Decision(title=f'Doomed decision {n}', owner=users['owner'], category='Health', is_public=True)
+              for n in range(3)]
+    db.session.add_all([*users.values(), decision, *options, *suggestions, *clarifications,
+                        *stage_suggestions, *doomed])
+    db.session.commit()
+    return {
+        **{name: user.id for name, user in users.items()},
+        'decision': decision.id,
+        'option': options[0].id,
+        'doomed_option': options[-1].id,
+        'suggestion': suggestions[0].id,
+        'ignored_suggestion': suggestions[1].id,
+        'clarification': clarifications[0].id,
+        'ignored_clarification': clarifications[1].id,
+        'stage_suggestion': stage_suggestions[0].id,
+        'ignored_stage_suggestion': stage_suggestions[1].id,
+        'doomed_decision': doomed[0].id,
+        'bulk_decision_1': doomed[1].id,
+        'bulk_decision_2': doomed[2].id,
+        'blob': blob_store.extract_images(image_pool(1, 4)[0]),
+        'anonymous': None,
+    }
+
+
+def _fill(value, fixtures):
+    if isinstance(value, str):
+        return value.format(**fixtures)
+    if isinstance(value, list):
+        return [_fill(item, fixtures) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, fixtures) for key, item in value.items()}
+    return value
+
+
+def _run_case(client, case, fixtures, counter, repeat):
+    # Reads are repeated and timed by their median; writes happen once.
+    # The query count is the largest seen, i.e. the one with cold caches.
+    viewer_id = fixtures[case.viewer]
+    runs = repeat if case.method == 'GET' else 1
+    queries, timings = [], []
+    for _ in range(runs):
+        with client.session_transaction() as session:
+            session.clear()
+            if viewer_id is not None:
+                session['_user_id'] = str(viewer_id)
+                session['_fresh'] = True
+        counter[0] = 0
+        started = time.perf_counter()
+        response = client.open(_fill(case.path, fixtures), method=case.method,
+                               data=_fill(case.data, fixtures), json=_fill(case.json, fixtures))
+        response.get_data()
+        timings.append(time.perf_counter() - started)
+        response.close()
+        queries.append(counter[0])
+    return response.status_code, max(queries), statistics.median(timings) * 1000
+
+
+def check_budgets(app, fixtures, size, repeat=3, time_factor=1.0):
+    """Make every case's request against app and compare it with its budget."""
+    counter = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        # Background writers (the action buffer, the categorizer) aren't the request's
+        if has_request_context():
+            counter[0] += 1
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count)
+    client = app.test_client()
+    results = []
+    try:
+        for case in CASES:
+            status, queries, ms = _run_case(client, case, fixtures, counter, repeat)
+            ms_budget = case.ms * time_factor
+            problems = []
+            if status != case.status:
+                problems.append(f'status {status}, expected {case.status}')
+            if queries > case.queries:
+                problems.append(f'{queries} queries, budget {case.queries}')
+            if ms > ms_budget:
+                problems.append(f'{ms:.1f}ms, budget {ms_budget:g}ms')
+            results.append({'endpoint': case.endpoint, 'viewer': case.viewer, 'method': case.method,
+                            'path': case.path, 'size': size, 'status': status, 'queries': queries,
+                            'query_budget': case.queries, 'ms': round(ms, 2), 'ms_budget': ms_budget,
+                            'problems': problems, 'ok': not problems})
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count)
+    return results
+
+
+def unbudgeted_endpoints(app):
+    """Endpoints of the main and auth blueprints that no case covers."""
+    covered = {case.endpoint for case in CASES}
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()
+                   if rule.endpoint.startswith(('main.', 'auth.'))} - covered)
+
+
+@contextmanager
+def scratch_app(directory):
+    """An app on a freshly migrated, empty database in directory (see
+    budget_config). Its background writers are stopped on the way out."""
+    app = create_app(budget_config(directory))
+    try:
+        with app.app_context():
+            upgrade(directory=MIGRATIONS)
+        yield app
+    finally:
+        # Stop the background writers before their database goes away
+        app.extensions['action_buffer'].shutdown()
+        app.extensions['categorizer'].shutdown()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def run_budgets(sizes=(200, 2000), repeat=3, time_factor=1.0):
+    """Check every case at each dataset size (decisions seeded), each in a
+    fresh scratch database, and return a report."""
+    results = []
+    missing = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix='decisions-budget-') as directory, scratch_app(directory) as app:
+            with app.app_context():
+                seed_dataset(users=max(size // 10, 2), decisions=size, actions=size * 25, seed=size)
+                fixtures = _create_fixtures()
+            missing = unbudgeted_endpoints(app)
+            results.extend(check_budgets(app, fixtures, size, repeat, time_factor))
+    return {'sizes': list(sizes), 'repeat': repeat, 'time_factor': time_factor,
+            'unbudgeted_endpoints': missing, 'results': results,
+            'ok': not missing and all(result['ok'] for result in results)}
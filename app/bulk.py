@@ -0,0 +1,66 @@
+from collections import Counter
+from app import db
+from app.models import (User, Decision, DecisionStageContent, Option, Suggestion, Clarification,
+                        StageSuggestion, UserAction, UserActivityDaily, DecisionActivityDaily)
+from app.facets import adjust_category_facets, facet_deltas_for_removal
+from app.search import search_index
+
+# What goes with a deleted decision, and what merely forgets it; the same
+# as the ORM cascades and the ON DELETE clauses on the foreign keys
+DECISION_CHILDREN = (DecisionStageContent, Option, Suggestion, Clarification, StageSuggestion,
+                     DecisionActivityDaily)
+DECISION_REFERENCES = (UserAction,)
+# A deleted user's decisions, suggestions and actions are kept without an author
+USER_CHILDREN = (UserActivityDaily,)
+USER_REFERENCES = (Decision, Suggestion, Clarification, StageSuggestion, UserAction)
+
+
+def chunked(ids, size):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _delete_in(model, column, ids):
+    table = model.__table__
+    return db.session.execute(table.delete().where(table.c[column].in_(ids))).rowcount
+
+
+def _detach_in(model, column, ids):
+    table = model.__table__
+    return db.session.execute(table.update().where(table.c[column].in_(ids)).values({column: None})).rowcount
+
+
+def delete_decisions(decision_ids, chunk_size=500):
+    """Delete decisions and their children with a few set-based statements
+    per chunk, without loading any of them. Returns row counts per table.
+
+    The caller commits.
+    """
+    counts = Counter()
+    for ids in chunked(decision_ids, chunk_size):
+        for model in DECISION_CHILDREN:
+            counts[model.__tablename__] += _delete_in(model, 'decision_id', ids)
+        for model in DECISION_REFERENCES:
+            _detach_in(model, 'decision_id', ids)
+        connection = db.session.connection()
+        if adjust_category_facets(connection, facet_deltas_for_removal(connection, ids)):
+            db.session.info['category_facets_changed'] = True
+        counts[Decision.__tablename__] += _delete_in(Decision, 'id', ids)
+        # No flush happens, so the search index isn't updated by its listener
+        if search_index.backend is not None and search_index.backend.incremental:
+            search_index.backend.update(connection, ids)
+    return counts
+
+
+def delete_users(user_ids, chunk_size=500):
+    """Delete users the same way; their content is kept and loses its author.
+    Returns row counts per table. The caller commits."""
+    counts = Counter()
+    for ids in chunked(user_ids, chunk_size):
+        for model in USER_CHILDREN:
+            counts[model.__tablename__] += _delete_in(model, 'user_id', ids)
+        for model in USER_REFERENCES:
+            _detach_in(model, 'user_id', ids)
+        counts[User.__tablename__] += _delete_in(User, 'id', ids)
+    return counts
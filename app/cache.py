@@ -0,0 +1,141 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.local import LocalProxy
+from app import db
+
+
+def cache_key(prompt, provider, model, json_mode=False):
+    # Prompts differing only in whitespace or case get the same answer
+    normalized = ' '.join(prompt.split()).casefold()
+    raw = '\x1f'.join([provider or '', model or '', 'json' if json_mode else 'text', normalized])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class AIResponseCache:
+    """Two-tier cache for AI completions keyed by cache_key().
+
+    Lookups go to an in-process LRU first, then to the AIResponse table, which
+    is shared between workers and survives restarts. Entries expire after
+    AI_CACHE_TTL seconds. The memory tier holds at most
+    AI_CACHE_MAX_MEMORY_ENTRIES; the table is pruned back to
+    AI_CACHE_MAX_DB_ENTRIES, oldest first, every AI_CACHE_PRUNE_EVERY writes.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['AI_CACHE_ENABLED']
+        self.ttl = timedelta(seconds=app.config['AI_CACHE_TTL'])
+        self.max_memory_entries = app.config['AI_CACHE_MAX_MEMORY_ENTRIES']
+        self.max_db_entries = app.config['AI_CACHE_MAX_DB_ENTRIES']
+        self.prune_every = app.config['AI_CACHE_PRUNE_EVERY']
+        self.clear_memory()
+        app.extensions['ai_cache'] = self
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._entries[key]
+
+        from app.models import AIResponse
+        table = AIResponse.__table__
+        # Use a separate connection so a lookup never touches the request's transaction
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                db.select(table.c.response, table.c.expires_at)
+                .where(table.c.key == key, table.c.expires_at > now)
+            ).first()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.db_hits += 1
+            self._remember(key, row.response, row.expires_at)
+        return row.response
+
+    def set(self, key, response, provider=None, model=None):
+        if not self.enabled:
+            return
+        from app.models import AIResponse
+        table = AIResponse.__table__
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(table.delete().where(table.c.key == key))
+                connection.execute(table.insert().values(
+                    key=key, provider=provider, model=model, response=response,
+                    created_at=now, expires_at=expires_at))
+            if prune:
+                self.prune()
+        except Exception as e:
+            # The memory tier still has it; a failed write only costs a later miss
+            self.app.logger.warning(f"Failed to store AI response in cache: {e}")
+
+    def prune(self):
+        """Delete expired rows, then the oldest rows beyond the size bound."""
+        from app.models import AIResponse
+        table = AIResponse.__table__
+        with db.engine.begin() as connection:
+            removed = connection.execute(
+                table.delete().where(table.c.expires_at <= datetime.utcnow())).rowcount
+            keep = db.select(table.c.key).order_by(table.c.created_at.desc()).limit(self.max_db_entries)
+            removed += connection.execute(
+                table.delete().where(table.c.key.not_in(keep.scalar_subquery()))).rowcount
+        return removed
+
+    def clear(self):
+        from app.models import AIResponse
+        self.clear_memory()
+        with db.engine.begin() as connection:
+            connection.execute(AIResponse.__table__.delete())
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'memory_hits': self.memory_hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'memory_entries': len(self._entries),
+        }
+
+    def _remember(self, key, response, expires_at):
+        # Caller holds self._lock
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_memory_entries:
+            self._entries.popitem(last=False)
+
+
+# The current app's AIResponseCache; create_app gives every app its own
+ai_cache = LocalProxy(lambda: current_app.extensions['ai_cache'])
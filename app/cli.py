@@ -0,0 +1,323 @@
+import json
+import os
+import tempfile
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.analytics import rebuild_activity_rollups
+from app.ai_stub import StubBehaviour, make_stub_server
+from app.budgets import run_budgets
+from app.cache import ai_cache
+from app.facets import rebuild_category_facets
+from app.loadtest import DEFAULT_MIX, ROUTES, seed_dataset, run_load
+from app.models import Decision
+from app.perf import explain_hot_paths, run_bench
+from app.search import search_index
+from app.tasks import categorizer
+
+rollups_cli = AppGroup('rollups', help='Maintain the activity rollups and category facets.')
+categorize_cli = AppGroup('categorize', help='Manage background AI categorization.')
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+perf_cli = AppGroup('perf', help='Check the performance of hot queries and load-test the app.')
+replicas_cli = AppGroup('replicas', help='Work with read replicas.')
+ai_cache_cli = AppGroup('ai-cache', help='Manage the AI response cache.')
+ai_cli = AppGroup('ai', help='Work with the AI provider.')
+
+
+@rollups_cli.command('rebuild')
+def rebuild_rollups():
+    """Rebuild the daily activity rollups and the category facet counts."""
+    rebuild_activity_rollups()
+    rebuild_category_facets()
+    click.echo('Activity rollups and category facets rebuilt.')
+
+
+@categorize_cli.command('pending')
+@click.option('--failed', is_flag=True, help='Also retry decisions whose categorization failed.')
+def categorize_pending(failed):
+    """Categorize decisions left pending (e.g. by a restart) synchronously."""
+    statuses = ['pending', 'failed'] if failed else ['pending']
+    ids = [row[0] for row in db.session.query(Decision.id).filter(Decision.category_status.in_(statuses))]
+    for decision_id in ids:
+        # run() only picks up pending decisions
+        Decision.query.filter_by(id=decision_id).update({'category_status': 'pending'})
+        db.session.commit()
+        categorizer.run(decision_id)
+    click.echo(f'Categorized {len(ids)} decisions.')
+
+
+@ai_cache_cli.command('prune')
+def prune_ai_cache():
+    """Drop expired cached AI responses and enforce the size bound."""
+    click.echo(f'Removed {ai_cache.prune()} cached responses.')
+
+
+@ai_cache_cli.command('clear')
+def clear_ai_cache():
+    """Drop every cached AI response."""
+    ai_cache.clear()
+    click.echo('AI response cache cleared.')
+
+
+
+@ai_cli.command('stub')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8808, show_default=True)
+@click.option('--latency', default='0', show_default=True,
+              help="Time to first token in ms: '250', 'uniform:100,500', 'normal:300,50', "
+                   "'lognormal:300,0.5' or 'exponential:300'.")
+@click.option('--tokens-per-second', default=0.0, show_default=True, help='Reply speed; 0 sends it all at once.')
+@click.option('--error-rate', default=0.0, show_default=True, help='Share of requests that fail.')
+@click.option('--error-status', 'error_statuses', multiple=True, type=int, default=[500], show_default=True,
+              help='HTTP status of a failure; repeat to pick at random.')
+@click.option('--hang-rate', default=0.0, show_default=True, help='Share of requests that stall first.')
+@click.option('--hang-seconds', default=120.0, show_default=True, help='How long a stalled request waits.')
+@click.option('--drop-rate', default=0.0, show_default=True,
+              help='Share of streams cut off part-way, without a final event.')
+@click.option('--mode', type=click.Choice(['canned', 'echo']), default='canned', show_default=True,
+              help="Reply with a plausible answer to the app's prompts, or with the prompt.")
+@click.option('--responses', type=click.File(), help='JSON list of {"match": regex, "reply": text}, tried first.')
+@click.option('--reply-words', default=120, show_default=True, help='Length of free-text canned replies.')
+@click.option('--seed', type=int, help='Random seed for the injected latency and failures.')
+@click.option('--quiet', is_flag=True, help="Don't log each request.")
+def ai_stub(host, port, latency, tokens_per_second, error_rate, error_statuses, hang_rate, hang_seconds,
+            drop_rate, mode, responses, reply_words, seed, quiet):
+    """Serve a local OpenAI-compatible chat.completions API (JSON mode and
+    streaming included) with injected latency and failures.
+
+    Point the app at it with AI_BASE_URL=http://HOST:PORT/v1 and any
+    AI_API_KEY.
+    """
+    try:
+        behaviour = StubBehaviour(
+            latency=latency, tokens_per_second=tokens_per_second, error_rate=error_rate,
+            error_statuses=error_statuses, hang_rate=hang_rate, hang_seconds=hang_seconds, drop_rate=drop_rate,
+            mode=mode, responses=[(item['match'], item['reply']) for item in json.load(responses)] if responses else (),
+            reply_words=reply_words, seed=seed)
+    except (ValueError, KeyError, TypeError) as e:
+        raise click.ClickException(f'Invalid stub settings: {e}')
+    server = make_stub_server(behaviour, host, port, quiet)
+    click.echo(f'AI stub listening on http://{host}:{server.server_address[1]}/v1 (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        click.echo(', '.join(f'{count} {what}' for what, count in behaviour.stats.items()))
+
+
+@search_cli.command('reindex')
+def reindex_search():
+    """Rebuild the search index from scratch."""
+    search_index.rebuild()
+    click.echo(f'Search index rebuilt ({search_index.backend.name}).')
+
+
+@perf_cli.command('explain')
+@click.option('--verbose', '-v', is_flag=True, help='Print every query plan, not just failures.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+def explain(verbose, as_json):
+    """Fail if any hot query falls back to a full table scan (SQLite only)."""
+    results = explain_hot_paths()
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            click.echo(f"{'ok  ' if result['ok'] else 'FAIL'} {result['name']}")
+            for query in result['queries']:
+                if verbose or query['full_scans']:
+                    click.echo('     ' + ' '.join(query['sql'].split()))
+                    for detail in query['plan']:
+                        click.echo(f'       {detail}')
+    failed = [result['name'] for result in results if not result['ok']]
+    if failed:
+        raise click.ClickException(f'{len(failed)} hot path(s) use a full table scan: {", ".join(failed)}')
+
+
+@perf_cli.command('bench')
+@click.option('--processes', default=4, show_default=True, help='Concurrent worker processes.')
+@click.option('--seconds', default=5.0, show_default=True, help='How long each run lasts.')
+@click.option('--write-ratio', default=0.2, show_default=True, help='Share of operations that commit a write.')
+@click.option('--path', default=os.path.join(tempfile.gettempdir(), 'decisions-bench.db'),
+              show_default=True, help='Scratch SQLite database; it is recreated for every run.')
+@click.option('--compare/--no-compare', default=True, show_default=True,
+              help='Also run with SQLite defaults (no engine tuning) for a before/after comparison.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+def bench(processes, seconds, write_ratio, path, compare, as_json):
+    """Measure read/write throughput of concurrent SQLite access."""
+    runs = [False, True] if compare else [True]
+    reports = [run_bench(path, current_app.config, tuned=tuned, processes=processes,
+                         seconds=seconds, write_ratio=write_ratio) for tuned in runs]
+    if as_json:
+        click.echo(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        click.echo(f"{'tuned' if report['tuned'] else 'defaults'}: {report['errors']} lock errors")
+        for kind in ('reads', 'writes'):
+            stats = report[kind]
+            click.echo(f"  {kind:6} {stats['per_second']:>9}/s  p50 {stats['p50_ms']}ms  "
+                       f"p95 {stats['p95_ms']}ms  p99 {stats['p99_ms']}ms")
+
+
+
+@perf_cli.command('seed')
+@click.option('--users', default=200, show_default=True, help='Users to create; the first is an admin.')
+@click.option('--decisions', default=2000, show_default=True, help='Decisions to create.')
+@click.option('--actions', default=50000, show_default=True, help='UserAction history rows to create.')
+@click.option('--image-ratio', default=0.05, show_default=True, help='Share of stage contents with a pasted image.')
+@click.option('--images', default=5, show_default=True, help='Distinct images to paste.')
+@click.option('--image-kb', default=400, show_default=True, help='Approximate size of each image.')
+@click.option('--days', default=365, show_default=True, help='How far back timestamps go.')
+@click.option('--prefix', default='load', show_default=True, help='Usernames are <prefix>_<n>.')
+@click.option('--password', default='password', show_default=True, help='Password of every seeded user.')
+@click.option('--seed', default=0, show_default=True, help='Random seed; the same seed gives the same data.')
+def seed(users, decisions, actions, image_ratio, images, image_kb, days, prefix, password, seed):
+    """Add a synthetic dataset to the database for load testing.
+
+    Run it against a scratch database (DATABASE_URL) after `flask db
+    upgrade`. No AI calls are made.
+    """
+    try:
+        counts = seed_dataset(users=users, decisions=decisions, actions=actions, image_ratio=image_ratio,
+                              images=images, image_kb=image_kb, days=days, prefix=prefix,
+                              password=password, seed=seed)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for table, count in counts.items():
+        click.echo(f'{table:24} {count:>9,}')
+
+
+def _parse_mix(ctx, param, value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise click.BadParameter(f'unknown route {name!r}; choose from {", ".join(ROUTES)}')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise click.BadParameter(f'weight of {name} must be a number')
+    if not any(mix.values()):
+        raise click.BadParameter('at least one route needs a positive weight')
+    return mix
+
+
+@perf_cli.command('load')
+@click.option('--requests', default=1000, show_default=True, help='Total requests to make.')
+@click.option('--concurrency', default=4, show_default=True, help='Concurrent client threads.')
+@click.option('--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+              show_default=True, callback=_parse_mix, help='Weighted route mix, as route=weight pairs.')
+@click.option('--image-ratio', default=0.05, show_default=True, help='Share of stage updates pasting an image.')
+@click.option('--image-kb', default=400, show_default=True, help='Approximate size of each pasted image.')
+@click.option('--seed', default=0, show_default=True, help='Random seed for the request sequence.')
+@click.option('--ai-base-url', help='Send AI calls here, e.g. to `flask ai stub`; otherwise they are switched off.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+def load(requests, concurrency, mix, image_ratio, image_kb, seed, ai_base_url, as_json):
+    """Replay a weighted mix of requests in-process and report latency
+    percentiles and throughput per route.
+
+    Writes go to the configured database, so point DATABASE_URL at a
+    seeded scratch copy. AI calls are switched off for the run unless
+    --ai-base-url is given; the suggest_options, refine_option and
+    ai_assist_stage routes exercise them.
+    """
+    try:
+        report = run_load(current_app._get_current_object(), requests=requests, concurrency=concurrency,
+                          mix=mix, image_ratio=image_ratio, image_kb=image_kb, seed=seed,
+                          ai_base_url=ai_base_url)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    click.echo(f"{report['requests']} requests in {report['seconds']}s ({report['per_second']}/s), "
+               f"{report['errors']} errors, concurrency {report['concurrency']}")
+    click.echo(f"  {'route':22} {'count':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in list(report['routes'].items()) + [('all', dict(report['overall'], errors=report['errors']))]:
+        click.echo(f"  {name:22} {stats['count']:>6} {stats['errors']:>6} {stats['per_second']:>8} "
+                   f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+
+@perf_cli.command('budget')
+@click.option('--sizes', default='200,2000', show_default=True,
+              help='Dataset sizes to check at, in decisions, comma-separated.')
+@click.option('--repeat', default=3, show_default=True, help='Times each read is made; its median time counts.')
+@click.option('--time-factor', default=1.0, show_default=True,
+              help='Scale every time budget, e.g. 2 on a slow machine.')
+@click.option('--report', type=click.Path(dir_okay=False, writable=True),
+              help='Also write the results as JSON to this file.')
+@click.option('--verbose', '-v', is_flag=True, help='Print every case, not just failures.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+def budget(sizes, repeat, time_factor, report, verbose, as_json):
+    """Fail if any route makes more SQL statements or takes longer than its
+    budget (see app/budgets.py).
+
+    Every route of the main and auth blueprints is requested against a
+    freshly migrated and seeded scratch database for each size; the
+    configured database is not used. AI calls are switched off. The query
+    budgets also run under pytest in tests/test_perf_budgets.py.
+    """
+    try:
+        sizes = [int(size) for size in sizes.split(',')]
+    except ValueError:
+        raise click.BadParameter('sizes must be whole numbers', param_hint='--sizes')
+    results = run_budgets(sizes=sizes, repeat=repeat, time_factor=time_factor)
+    if report:
+        with open(report, 'w') as f:
+            json.dump(results, f, indent=2)
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+    else:
+        for result in results['results']:
+            if verbose or not result['ok']:
+                click.echo(f"{'ok  ' if result['ok'] else 'FAIL'} {result['size']:>6} {result['endpoint']} "
+                           f"({result['viewer']}) {result['method']} {result['path']}: "
+                           f"{result['queries']}/{result['query_budget']} queries, "
+                           f"{result['ms']}/{result['ms_budget']:g}ms")
+                for problem in result['problems']:
+                    click.echo(f'       {problem}')
+        for endpoint in results['unbudgeted_endpoints']:
+            click.echo(f'FAIL no budget for {endpoint}')
+    failed = [result for result in results['results'] if not result['ok']]
+    if failed or results['unbudgeted_endpoints']:
+        raise click.ClickException(f'{len(failed)} case(s) over budget, '
+                                   f'{len(results["unbudgeted_endpoints"])} route(s) without a budget')
+    if not as_json:
+        click.echo(f"All {len(results['results'])} cases within budget at sizes {', '.join(map(str, sizes))}.")
+
+@replicas_cli.command('sync')
+def sync_replicas():
+    """Copy the primary into every SQLite replica.
+
+    Stands in for real replication when trying replicas out locally with
+    SQLite files.
+    """
+    primary = db.engine
+    if primary.dialect.name != 'sqlite':
+        raise click.ClickException('Only SQLite databases can be synced this way.')
+    for key in current_app.extensions['replicas']:
+        replica = db.engines[key]
+        if replica.dialect.name != 'sqlite':
+            click.echo(f'Skipping {key}: not SQLite.')
+            continue
+        source = primary.raw_connection()
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        click.echo(f'Copied primary to {key} ({replica.url.database}).')
+
+
+def init_app(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(categorize_cli)
+    app.cli.add_command(ai_cache_cli)
+    app.cli.add_command(ai_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(perf_cli)
+    app.cli.add_command(replicas_cli)
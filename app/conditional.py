@@ -0,0 +1,61 @@
+import hashlib
+import os
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+
+def release_stamp(root):
+    """Fingerprint of the code and templates under root, so that a deploy
+    changes every ETag even where the data didn't."""
+    stamps = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if name != '__pycache__']
+        for filename in filenames:
+            if filename.endswith(('.py', '.html')):
+                path = os.path.join(dirpath, filename)
+                stamps.append((os.path.relpath(path, root), os.stat(path).st_mtime_ns))
+    return hashlib.sha1(repr(sorted(stamps)).encode()).hexdigest()[:12]
+
+
+def init_app(app):
+    app.extensions['release_stamp'] = release_stamp(app.root_path)
+
+
+def viewer_key():
+    # Pages differ per viewer (navbar, owner controls), and a profile edit changes them
+    if current_user.is_authenticated:
+        return current_user.id, current_user.updated_at
+    return None
+
+
+def make_etag(*parts):
+    raw = repr((current_app.extensions['release_stamp'], viewer_key()) + parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def latest(*timestamps):
+    return max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
+
+
+def conditional(etag, last_modified, render):
+    """Answer a conditional GET with a 304 when the client's copy is current,
+    without calling render(); otherwise return render()'s response with
+    ETag and Last-Modified set.
+
+    Never 304 while flashed messages are waiting: they are only shown, and
+    consumed, by rendering the page.
+    """
+    if '_flashes' not in session and not is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Revalidate on every use, and only in the viewer's own cache
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
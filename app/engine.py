@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from app import db
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def sqlite_pragmas(config):
+    """PRAGMAs applied to every new SQLite connection, in order.
+
+    journal_mode=WAL lets readers run alongside the single writer instead of
+    being blocked by it, and busy_timeout makes a writer wait for the lock
+    rather than failing at once with "database is locked".
+    """
+    pragmas = [
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+    ]
+    return [(name, value) for name, value in pragmas if value is not None]
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured backend. Options already
+    set in SQLALCHEMY_ENGINE_OPTIONS win."""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        # The driver's own lock timeout, in seconds, matching PRAGMA busy_timeout
+        connect_args = dict(options.get('connect_args') or {})
+        if config['SQLITE_BUSY_TIMEOUT'] is not None:
+            connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT'] / 1000)
+        options['connect_args'] = connect_args
+    else:
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def configure(app):
+    """Engine tuning, in two steps: call before db.init_app() to set the
+    pool/driver options, and init_app() after it to install per-connection
+    settings on the engines it created."""
+    if app.config['DB_TUNING_ENABLED']:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def init_app(app):
+    if not app.config['DB_TUNING_ENABLED']:
+        return
+    with app.app_context():
+        # The primary and any other binds, e.g. read replicas
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                apply_sqlite_pragmas(engine, sqlite_pragmas(app.config))
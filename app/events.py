@@ -0,0 +1,143 @@
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime
+from flask import current_app
+from werkzeug.local import LocalProxy
+from app import db
+
+
+class ActionBuffer:
+    """Queues UserAction rows in memory and writes them in batches from a
+    background thread, so hot read paths don't commit on every request.
+
+    The queue is bounded. When it is full, the 'drop' policy discards the
+    event and the 'block' policy waits up to ACTION_BUFFER_BLOCK_TIMEOUT
+    seconds for room before discarding. Pending events are flushed at exit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Guards dropped, written and failed, which request threads and the
+        # flush thread both update
+        self._counts_lock = threading.Lock()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.app is not None:
+            # Re-binding to a new app: write out whatever the old one queued
+            self.shutdown()
+        self.app = app
+        self.enabled = app.config['ACTION_BUFFER_ENABLED']
+        self.batch_size = app.config['ACTION_BUFFER_BATCH_SIZE']
+        self.flush_interval = app.config['ACTION_BUFFER_FLUSH_INTERVAL']
+        self.policy = app.config['ACTION_BUFFER_POLICY']
+        self.block_timeout = app.config['ACTION_BUFFER_BLOCK_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['ACTION_BUFFER_MAX_SIZE'])
+        self._stop.clear()
+        app.extensions['action_buffer'] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def record(self, user_id, action_type, decision_id=None):
+        if not self.enabled:
+            from app.models import UserAction
+            db.session.add(UserAction(user_id=user_id, action_type=action_type, decision_id=decision_id))
+            db.session.commit()
+            return
+
+        self._ensure_worker()
+        event = {'user_id': user_id, 'action_type': action_type,
+                 'decision_id': decision_id, 'timestamp': datetime.utcnow()}
+        try:
+            if self.policy == 'block':
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._counts_lock:
+                self.dropped += 1
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        if self._queue is not None:
+            self.flush()
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked worker process: the parent's queue and thread don't carry over
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='action-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        from app.models import UserAction
+        with self.app.app_context():
+            try:
+                db.session.add_all([UserAction(**event) for event in batch])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                with self._counts_lock:
+                    self.failed += len(batch)
+                self.app.logger.error(f"Failed to write {len(batch)} buffered actions: {e}")
+            else:
+                with self._counts_lock:
+                    self.written += len(batch)
+
+
+# The current app's ActionBuffer; create_app gives every app its own
+action_buffer = LocalProxy(lambda: current_app.extensions['action_buffer'])
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import Counter
+from flask import current_app
+from werkzeug.local import LocalProxy
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.analytics import increment_rollup
+from app.models import Decision, CategoryFacet
+
+
+class CategoryFacetCache:
+    """In-process cache of the category facets shown on the home page.
+
+    Entries live for CATEGORY_FACETS_TTL seconds. A commit that changes the
+    counts drops this process's copy at once; other workers catch up when
+    their copy expires.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self._facets = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config['CATEGORY_FACETS_TTL']
+        self.invalidate()
+        app.extensions['category_facets'] = self
+
+    def get(self):
+        """[(category, public_count, private_count)] for every category in
+        use, by name."""
+        with self._lock:
+            if self._facets is not None and self._expires_at > time.monotonic():
+                return self._facets
+        facets = load_category_facets()
+        with self._lock:
+            self._facets = facets
+            self._expires_at = time.monotonic() + self.ttl
+        return facets
+
+    def invalidate(self):
+        with self._lock:
+            self._facets = None
+
+
+# The current app's CategoryFacetCache; create_app gives every app its own
+category_facets = LocalProxy(lambda: current_app.extensions['category_facets'])
+
+
+def load_category_facets():
+    counts = {}
+    for category, is_public, count in db.session.execute(
+            db.select(CategoryFacet.category, CategoryFacet.is_public, CategoryFacet.count)
+            .where(CategoryFacet.count > 0)):
+        public_count, private_count = counts.get(category, (0, 0))
+        if is_public:
+            public_count += count
+        else:
+            private_count += count
+        counts[category] = (public_count, private_count)
+    return [(category, *counts[category]) for category in sorted(counts, key=str.casefold)]
+
+
+def adjust_category_facets(connection, deltas):
+    """Apply {(category, is_public): change} to the facet counts."""
+    rows = [{'category': category, 'is_public': is_public, 'count': change}
+            for (category, is_public), change in deltas.items() if category and change]
+    if rows:
+        increment_rollup(connection, CategoryFacet, rows)
+    return bool(rows)
+
+
+def facet_deltas_for_removal(connection, decision_ids):
+    # Takes the given decisions, as stored, out of the counts; used for
+    # set-based deletes, which bypass the flush hook below
+    rows = connection.execute(
+        db.select(Decision.category, Decision.is_public, db.func.count())
+        .where(Decision.id.in_(decision_ids))
+        .group_by(Decision.category, Decision.is_public))
+    return Counter({_facet_key(category, is_public): -count for category, is_public, count in rows})
+
+
+def rebuild_category_facets():
+    """Recompute the facet counts from the decision table."""
+    db.session.execute(db.delete(CategoryFacet))
+    db.session.execute(
+        db.insert(CategoryFacet).from_select(
+            ['category', 'is_public', 'count'],
+            db.select(Decision.category, db.func.coalesce(Decision.is_public, True), db.func.count(Decision.id))
+            .where(Decision.category.isnot(None), Decision.category != '')
+            .group_by(Decision.category, db.func.coalesce(Decision.is_public, True))
+        )
+    )
+    db.session.commit()
+    category_facets.invalidate()
+
+
+def _facet_key(category, is_public):
+    # is_public defaults to True, and isn't set on a new decision until it is inserted
+    return category, is_public is not False
+
+
+def _committed_facet_key(decision):
+    state = inspect(decision)
+    values = []
+    for attr in ('category', 'is_public'):
+        history = state.attrs[attr].load_history()
+        if history.added and not history.deleted:
+            # Assigned without the old value ever being loaded
+            return None
+        old = history.deleted or history.unchanged
+        values.append(old[0] if old else None)
+    return _facet_key(*values)
+
+
+@event.listens_for(Session, 'before_flush')
+def update_category_facets(session, flush_context, instances):
+    deltas = Counter()
+    unknown = []
+    for obj in session.new:
+        if isinstance(obj, Decision):
+            deltas[_facet_key(obj.category, obj.is_public)] += 1
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Decision) or obj in session.new:
+            continue
+        deleted = obj in session.deleted
+        state = inspect(obj)
+        if not deleted and not any(state.attrs[attr].history.has_changes() for attr in ('category', 'is_public')):
+            continue
+        old_key = _committed_facet_key(obj)
+        if old_key is None:
+            unknown.append(obj.id)
+        else:
+            deltas[old_key] -= 1
+        if not deleted:
+            deltas[_facet_key(obj.category, obj.is_public)] += 1
+    if unknown:
+        # The rows still hold the old values until this flush writes them
+        deltas.update(facet_deltas_for_removal(session.connection(), unknown))
+    if adjust_category_facets(session.connection(), deltas):
+        session.info['category_facets_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_category_facets(session):
+    if session.info.pop('category_facets_changed', False):
+        category_facets.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_category_facet_changes(session):
+    session.info.pop('category_facets_changed', None)
@@ -0,0 +1,141 @@
+import json
+import threading
+from collections import OrderedDict
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+
+def decision_fragment_key(name, decision):
+    # Decision.version moves on every write to the decision or its children;
+    # the release stamp on every deploy, which may change the markup
+    return f"fragment:{current_app.extensions['release_stamp']}:{name}:{decision.id}:{decision.version}"
+
+
+class MemoryBackend:
+    """In-process LRU, one per worker."""
+
+    name = 'memory'
+
+    def __init__(self, app):
+        self.max_entries = app.config['FRAGMENT_CACHE_MAX_ENTRIES']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Redis (or anything speaking its protocol) at FRAGMENT_CACHE_URL, shared by
+    all workers. Stale versions are never read again and expire after
+    FRAGMENT_CACHE_TTL seconds."""
+
+    name = 'redis'
+
+    def __init__(self, app):
+        import redis
+        self.client = redis.Redis.from_url(app.config['FRAGMENT_CACHE_URL'])
+        self.ttl = app.config['FRAGMENT_CACHE_TTL']
+
+    def get(self, key):
+        value = self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(key, json.dumps(value), ex=self.ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter('fragment:*'):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter('fragment:*'))
+
+
+class FragmentCache:
+    """Cache for rendered, user-independent parts of pages.
+
+    Keys carry the version of the data they were rendered from (see
+    decision_fragment_key), so nothing is ever invalidated explicitly: a
+    write bumps the version and the next render misses. FRAGMENT_CACHE_BACKEND
+    is 'memory', 'redis' or 'none'; if the redis package is missing the
+    in-process LRU is used instead.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        name = app.config['FRAGMENT_CACHE_BACKEND']
+        self.backend = None
+        if name == 'redis':
+            try:
+                self.backend = RedisBackend(app)
+            except ImportError:
+                app.logger.warning("redis is not installed; using the in-process fragment cache")
+                name = 'memory'
+        if name == 'memory':
+            self.backend = MemoryBackend(app)
+        app.extensions['fragment_cache'] = self
+
+    def get_or_render(self, key, render):
+        """Return the cached value for key, or call render() and cache what it returns.
+
+        Values must be JSON-serializable so every backend can store them.
+        """
+        if self.backend is None:
+            return render()
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            # An unreachable cache server costs a render, not the page
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = render()
+        try:
+            self.backend.set(key, value)
+        except Exception:
+            pass
+        return value
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        return {
+            'backend': self.backend.name if self.backend is not None else 'none',
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.backend) if self.backend is not None else 0,
+        }
+
+
+# The current app's FragmentCache; create_app gives every app its own
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache'])
+
@@ -0,0 +1,334 @@
+import base64
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app import db
+from app.analytics import rebuild_activity_rollups
+from app.blobs import blob_store
+from app.facets import rebuild_category_facets
+from app.models import User, Decision, DecisionStageContent, Option, Suggestion, Clarification, UserAction
+from app.perf import latency_stats
+from app.search import search_index
+
+CATEGORIES = ['Career', 'Personal Finance', 'Health', 'Education', 'Travel', 'Shopping', 'Technology',
+              'Housing', 'Relationships', 'General']
+# Relative frequency of each UserAction type; reads dominate, as in production
+ACTION_TYPES = {'read': 70, 'asked': 8, 'suggestion': 8, 'clarification': 7, 'stage_suggestion': 7}
+WORDS = '''
+    option budget risk team move offer salary family city timeline contract savings school
+    career partner health plan house rent mortgage project launch market client deadline
+    manager promotion course degree trip visa car loan equity startup product customer
+    interview feedback tradeoff cost benefit value priority goal constraint stakeholder
+    evidence data benchmark pilot trial review outcome regret scenario worst best case
+    long short term commitment execution milestone resource flexibility legacy growth
+'''.split()
+
+# Route name -> relative weight in the default load mix
+DEFAULT_MIX = {'index': 40, 'view_decision': 35, 'update_stage_content': 10,
+               'add_suggestion': 10, 'admin': 5}
+
+
+def _sentence(rng, low=6, high=16):
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraphs(rng, count):
+    return '\n'.join(' '.join(_sentence(rng) for _ in range(rng.randint(1, 4))) for _ in range(count))
+
+
+def _png(width, height, rng):
+    # Noise barely compresses, so the file is about width * height * 3 bytes
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 1))
+            + chunk(b'IEND', b''))
+
+
+def image_pool(count, size_kb, seed=0):
+    """Data URIs of count distinct PNGs of about size_kb each, the same for
+    the same arguments, so seeding and load runs share their blobs."""
+    rng = random.Random(f'images-{seed}')
+    side = max(1, int(math.sqrt(size_kb * 1024 / 3)))
+    return [f'data:image/png;base64,{base64.b64encode(_png(side, side, rng)).decode()}' for _ in range(count)]
+
+
+def stage_html(rng, images=(), image_ratio=0.0):
+    """Rich-text stage content as the editor produces it, sometimes with a
+    pasted image."""
+    parts = [f'<p>{_sentence(rng)} <strong>{_sentence(rng, 2, 5)}</strong> {_sentence(rng)}</p>']
+    for _ in range(rng.randint(0, 3)):
+        parts.append(f'<p>{_paragraphs(rng, 1)}</p>')
+    if rng.random() < 0.5:
+        parts.append('<ul>' + ''.join(f'<li>{_sentence(rng, 3, 8)}</li>' for _ in range(rng.randint(2, 5))) + '</ul>')
+    if images and rng.random() < image_ratio:
+        parts.append(f'<p><img src="{rng.choice(images)}"></p>')
+    return ''.join(parts)
+
+
+def _insert(model, rows, batch_size=1000):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(model), rows[start:start + batch_size])
+    return len(rows)
+
+
+def _advance_id_sequence(model):
+    # Rows inserted with explicit ids leave a PostgreSQL sequence behind, so
+    # the app's next insert would collide; SQLite and MySQL keep up by themselves
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    table = model.__table__.name
+    db.session.execute(db.text("SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                               f'(SELECT MAX(id) FROM "{table}"))'), {'table': f'"{table}"'})
+
+
+def seed_dataset(users=200, decisions=2000, actions=50000, image_ratio=0.05, images=5, image_kb=400,
+                 days=365, prefix='load', password='password', seed=0):
+    """Add a synthetic dataset: users named <prefix>_<n> (the first one an
+    admin) sharing one password, decisions with stage content, options,
+    suggestions and clarifications, and a UserAction history spread over
+    the last days.
+
+    Rows are bulk-inserted, bypassing the flush hooks, so the rollups,
+    category facets and search index are rebuilt afterwards. Returns row
+    counts per table.
+    """
+    rng = random.Random(seed)
+    if db.session.query(User.id).filter(User.username.startswith(f'{prefix}_', autoescape=True)).first():
+        raise ValueError(f'Users named {prefix}_* already exist; pick another prefix')
+
+    now = datetime.utcnow()
+
+    def moment(after=None):
+        start = after or now - timedelta(days=days)
+        return start + (now - start) * rng.random()
+
+    # Pasted images go to the blob store, as update_stage_content does it
+    blob_images = [blob_store.extract_images(uri) for uri in image_pool(images, image_kb, seed)]
+    counts = Counter()
+
+    first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    user_ids = list(range(first_user, first_user + users))
+    password_hash = generate_password_hash(password)
+    counts['user'] = _insert(User, [
+        {'id': user_id, 'username': f'{prefix}_{n}', 'email': f'{prefix}_{n}@example.invalid',
+         'password_hash': password_hash, 'is_admin': n == 0, 'updated_at': moment(),
+         'headline': _sentence(rng, 3, 8), 'about': _paragraphs(rng, 2), 'location': rng.choice(WORDS).title(),
+         'skills': ', '.join(rng.sample(WORDS, 4))}
+        for n, user_id in enumerate(user_ids)])
+
+    # A few users own most decisions
+    owner_weights = [1 / (n + 1) for n in range(users)]
+    first_decision = (db.session.query(db.func.max(Decision.id)).scalar() or 0) + 1
+    decision_rows, stage_rows, option_rows, suggestion_rows, clarification_rows = [], [], [], [], []
+    stage_keys = [stage_key for stage_key, _ in Decision.STAGES]
+    for decision_id, owner_id in zip(range(first_decision, first_decision + decisions),
+                                     rng.choices(user_ids, owner_weights, k=decisions)):
+        created_at = moment()
+        reached = rng.randrange(len(stage_keys))
+        decision_rows.append({
+            'id': decision_id, 'user_id': owner_id, 'title': _sentence(rng, 4, 12)[:140],
+            'created_at': created_at, 'updated_at': moment(created_at),
+            'deadline': created_at + timedelta(days=rng.randint(7, 180)) if rng.random() < 0.4 else None,
+            'stage': stage_keys[reached], 'category': rng.choice(CATEGORIES), 'category_status': 'done',
+            'status': 'closed' if reached == len(stage_keys) - 1 and rng.random() < 0.5 else 'open',
+            'is_public': rng.random() < 0.8,
+        })
+        for stage_key in stage_keys[:reached + 1]:
+            if rng.random() < 0.8:
+                stage_rows.append({'decision_id': decision_id, 'stage_key': stage_key,
+                                   'content': stage_html(rng, blob_images, image_ratio)})
+        for _ in range(rng.randint(0, 6)):
+            option_rows.append({'decision_id': decision_id, 'title': _sentence(rng, 2, 6)[:140],
+                                'description': _paragraphs(rng, 1), 'pros': _sentence(rng), 'cons': _sentence(rng)})
+        for _ in range(rng.randint(0, 4)):
+            suggestion_rows.append({
+                'decision_id': decision_id, 'user_id': rng.choice(user_ids), 'title': _sentence(rng, 2, 6)[:140],
+                'description': _paragraphs(rng, 1), 'pros': _sentence(rng), 'cons': _sentence(rng),
+                'status': rng.choices(['pending', 'accepted', 'ignored'], [2, 1, 1])[0],
+                'created_at': moment(created_at)})
+        for _ in range(rng.randint(0, 3)):
+            clarification_rows.append({
+                'decision_id': decision_id, 'user_id': rng.choice(user_ids), 'message': _paragraphs(rng, 1),
+                'status': rng.choices(['pending', 'ignored', 'applied'], [2, 1, 1])[0],
+                'created_at': moment(created_at)})
+    counts['decision'] = _insert(Decision, decision_rows)
+    counts['decision_stage_content'] = _insert(DecisionStageContent, stage_rows)
+    counts['option'] = _insert(Option, option_rows)
+    counts['suggestion'] = _insert(Suggestion, suggestion_rows)
+    counts['clarification'] = _insert(Clarification, clarification_rows)
+    for model in (User, Decision):
+        _advance_id_sequence(model)
+
+    decision_ids = [row['id'] for row in decision_rows]
+    action_types = list(ACTION_TYPES)
+    action_weights = list(ACTION_TYPES.values())
+    for start in range(0, actions, 10000):
+        batch = min(10000, actions - start)
+        counts['user_action'] += _insert(UserAction, [
+            {'user_id': user_id, 'action_type': action_type, 'timestamp': moment(),
+             'decision_id': rng.choice(decision_ids) if decision_ids else None}
+            for user_id, action_type in zip(rng.choices(user_ids, k=batch),
+                                            rng.choices(action_types, action_weights, k=batch))])
+    db.session.commit()
+
+    rebuild_activity_rollups()
+    rebuild_category_facets()
+    search_index.rebuild()
+    return counts
+
+
+def _load_targets():
+    owned = defaultdict(list)
+    public = []
+    for decision_id, owner_id, is_public in db.session.execute(
+            db.select(Decision.id, Decision.user_id, Decision.is_public).where(Decision.user_id.isnot(None))):
+        owned[owner_id].append(decision_id)
+        if is_public is not False:
+            public.append((decision_id, owner_id))
+    admin_id = db.session.execute(db.select(User.id).where(User.is_admin.is_(True)).limit(1)).scalar()
+    if not owned or not public or admin_id is None:
+        raise ValueError('Load runs need an admin, and users owning public decisions; run `flask perf seed` first')
+    return {'owners': sorted(owned), 'owned': dict(owned), 'public': public, 'admin_id': admin_id}
+
+
+def _index(rng, targets, images, image_ratio):
+    return rng.choice(targets['owners']), 'GET', '/index', {}
+
+
+def _view_decision(rng, targets, images, image_ratio):
+    decision_id, _ = rng.choice(targets['public'])
+    return rng.choice(targets['owners']), 'GET', f'/decision/{decision_id}', {}
+
+
+def _update_stage_content(rng, targets, images, image_ratio):
+    owner_id = rng.choice(targets['owners'])
+    decision_id = rng.choice(targets['owned'][owner_id])
+    stage_key = rng.choice(Decision.STAGES)[0]
+    return owner_id, 'POST', f'/decision/{decision_id}/update_stage_content', {
+        'json': {'stage_key': stage_key, 'content': stage_html(rng, images, image_ratio)}}
+
+
+def _add_suggestion(rng, targets, images, image_ratio):
+    user_id = rng.choice(targets['owners'])
+    for _ in range(10):
+        decision_id, owner_id = rng.choice(targets['public'])
+        if owner_id != user_id:
+            break
+    return user_id, 'POST', f'/decision/{decision_id}/add_suggestion', {'data': {
+        'title': _sentence(rng, 2, 6)[:140], 'description': _paragraphs(rng, 1),
+        'pros': _sentence(rng), 'cons': _sentence(rng)}}
+
+
+def _admin(rng, targets, images, image_ratio):
+    return targets['admin_id'], 'GET', f'/admin?page={rng.randint(1, 3)}', {}
+
+
+def _own_decision(rng, targets):
+    owner_id = rng.choice(targets['owners'])
+    return owner_id, rng.choice(targets['owned'][owner_id])
+
+
+def _suggest_options(rng, targets, images, image_ratio):
+    owner_id, decision_id = _own_decision(rng, targets)
+    return owner_id, 'GET', f'/decision/{decision_id}/suggest_options', {}
+
+
+def _refine_option(rng, targets, images, image_ratio):
+    owner_id, decision_id = _own_decision(rng, targets)
+    return owner_id, 'POST', f'/decision/{decision_id}/refine_option', {'json': {'title': _sentence(rng, 2, 6)}}
+
+
+def _ai_assist_stage(rng, targets, images, image_ratio):
+    owner_id, decision_id = _own_decision(rng, targets)
+    return owner_id, 'POST', f'/decision/{decision_id}/ai_assist_stage', {
+        'json': {'stage_key': rng.choice(Decision.STAGES)[0], 'content': stage_html(rng)}}
+
+
+# Route name -> callable(rng, targets, images, image_ratio) giving the
+# (user id, method, path, test client options) of one request
+ROUTES = {
+    'index': _index,
+    'view_decision': _view_decision,
+    'update_stage_content': _update_stage_content,
+    'add_suggestion': _add_suggestion,
+    'admin': _admin,
+    # These call the AI provider; see run_load's ai_base_url
+    'suggest_options': _suggest_options,
+    'refine_option': _refine_option,
+    'ai_assist_stage': _ai_assist_stage,
+}
+
+
+def run_load(app, requests=1000, concurrency=4, mix=None, image_ratio=0.05, images=5, image_kb=400, seed=0,
+             ai_base_url=None):
+    """Replay a weighted mix of requests against app in-process, from
+    concurrency threads with a test client each, and report throughput and
+    latency percentiles per route.
+
+    Each request is made as a user who may make it (an owner for their own
+    decision, someone else for a suggestion, an admin for /admin). CSRF
+    checks are switched off for the run, and so are AI calls unless
+    ai_base_url points them at a stand-in such as `flask ai stub`.
+    """
+    mix = mix or DEFAULT_MIX
+    if ai_base_url:
+        app.config['AI_BASE_URL'] = ai_base_url
+        app.config['AI_API_KEY'] = app.config.get('AI_API_KEY') or 'stub'
+    else:
+        app.config['AI_API_KEY'] = None
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        targets = _load_targets()
+    pool = image_pool(images, image_kb, seed) if image_ratio else []
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = defaultdict(list)
+    errors = Counter()
+    lock = threading.Lock()
+
+    def worker(number, count):
+        rng = random.Random(f'load-{seed}-{number}')
+        client = app.test_client()
+        for _ in range(count):
+            name = rng.choices(names, weights)[0]
+            user_id, method, path, options = ROUTES[name](rng, targets, pool, image_ratio)
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+            started = time.perf_counter()
+            response = client.open(path, method=method, **options)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            response.close()
+            with lock:
+                latencies[name].append(elapsed)
+                if response.status_code >= 400:
+                    errors[name] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        shares = [requests // concurrency + (number < requests % concurrency) for number in range(concurrency)]
+        for future in [executor.submit(worker, number, share) for number, share in enumerate(shares)]:
+            future.result()
+    seconds = time.perf_counter() - started
+
+    routes = {}
+    for name in names:
+        routes[name] = latency_stats(latencies[name], seconds)
+        routes[name]['errors'] = errors[name]
+    return {'requests': requests, 'concurrency': concurrency, 'seconds': round(seconds, 2),
+            'per_second': round(requests / seconds, 1) if seconds else 0.0,
+            'errors': sum(errors.values()),
+            'overall': latency_stats([value for values in latencies.values() for value in values], seconds),
+            'routes': routes}
@@ -0,0 +1,225 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from werkzeug.local import LocalProxy
+from sqlalchemy import event
+from app import db
+
+# Upper bounds, in seconds, of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Work timed within a request: key -> (Server-Timing description, metric name, unit counted)
+KINDS = {
+    'sql': ('SQL', 'sql', 'queries'),
+    'tpl': ('Templates', 'template', 'renders'),
+    'ai': ('AI provider', 'ai', 'calls'),
+}
+
+HELP = {
+    'http_request_duration_seconds': 'Time to handle a request.',
+    'http_requests_total': 'Requests handled.',
+    **{f'http_request_{name}_seconds': f'{description} time per request.'
+       for description, name, _ in KINDS.values()},
+    **{f'http_request_{name}_{unit}_total': f'{description} {unit} made by requests.'
+       for description, name, unit in KINDS.values()},
+    # Recorded by app/resilience.py, in and outside requests
+    'ai_call_duration_seconds': 'Time per AI provider call attempt.',
+    'ai_calls_total': 'AI provider call attempts, by outcome.',
+    'ai_retries_total': 'AI provider calls retried after a transient failure.',
+    'ai_breaker_state': 'AI circuit breaker state: 0 closed, 1 half-open, 2 open.',
+    'ai_breaker_transitions_total': 'AI circuit breaker state changes, by new state.',
+}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """Per-request timings of SQL, template rendering and AI provider calls.
+
+    Each response gets the request's totals in a Server-Timing header, and
+    they are added to per-endpoint histograms served in Prometheus text
+    format on /metrics. Template time includes any SQL run while rendering.
+    The figures are per process; every worker reports its own.
+
+    observe(), increment() and gauge() add other figures to /metrics, from
+    any thread.
+
+    With METRICS_ENABLED off, no hooks are installed at all.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._histograms = {}
+        self._counters = Counter()
+        self._gauges = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['METRICS_ENABLED']
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        with app.app_context():
+            # The primary and any other binds, e.g. read replicas
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_before_render_template, app)
+        template_rendered.connect(_template_rendered, app)
+        app.before_request(_start_request)
+        app.after_request(self._finish_request)
+
+    def _finish_request(self, response):
+        timings = g.pop('metrics_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - g.pop('metrics_started')
+        endpoint = request.endpoint or 'none'
+        with self._lock:
+            self._observe('http_request_duration_seconds', endpoint, total)
+            self._counters['http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                                   ('status', str(response.status_code)))] += 1
+            for kind, (_, name, unit) in KINDS.items():
+                count, seconds = timings[kind]
+                self._observe(f'http_request_{name}_seconds', endpoint, seconds)
+                self._counters[f'http_request_{name}_{unit}_total', (('endpoint', endpoint),)] += count
+        entries = [f'{kind};dur={seconds * 1000:.1f};desc="{description} ({count})"'
+                   for kind, (description, _, _) in KINDS.items()
+                   for count, seconds in [timings[kind]] if count]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    def observe(self, name, endpoint, value):
+        """Add value to the name histogram of endpoint."""
+        if self.enabled:
+            with self._lock:
+                self._observe(name, endpoint, value)
+
+    def increment(self, name, amount=1, **labels):
+        """Add amount to the name counter with these labels."""
+        if self.enabled:
+            with self._lock:
+                self._counters[name, tuple(labels.items())] += amount
+
+    def gauge(self, name, read):
+        """Report read(), a number, as the name gauge."""
+        self._gauges[name] = read
+
+    def _observe(self, name, endpoint, value):
+        histogram = self._histograms.get((name, endpoint))
+        if histogram is None:
+            histogram = self._histograms[name, endpoint] = Histogram()
+        histogram.observe(value)
+
+    def render(self):
+        """Everything collected so far, in Prometheus text format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        described = set()
+        for (name, endpoint), histogram in histograms:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {HELP[name]}')
+                lines.append(f'# TYPE {name} histogram')
+            label = f'endpoint="{_escape(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{label}}} {cumulative}')
+        for (name, labels), value in counters:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {HELP[name]}')
+                lines.append(f'# TYPE {name} counter')
+            label = ','.join(f'{key}="{_escape(label_value)}"' for key, label_value in labels)
+            lines.append(f'{name}{{{label}}} {value}' if label else f'{name} {value}')
+        for name, read in gauges:
+            lines.append(f'# HELP {name} {HELP[name]}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {read()}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+# The current app's Metrics; create_app gives every app its own
+metrics = LocalProxy(lambda: current_app.extensions['metrics'])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _timings():
+    # None outside requests (background workers) and when metrics are off
+    if has_request_context():
+        return g.get('metrics_timings')
+    return None
+
+
+def record(kind, seconds, count=1):
+    """Add seconds of kind work to the current request's totals."""
+    timings = _timings()
+    if timings is not None:
+        timings[kind][0] += count
+        timings[kind][1] += seconds
+
+
+@contextmanager
+def track(kind):
+    """Time the block as kind work of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, time.perf_counter() - started)
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_timings = {kind: [0, 0.0] for kind in KINDS}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _timings() is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_started', None)
+    if started is not None:
+        record('sql', time.perf_counter() - started)
+
+
+def _before_render_template(sender, template, context, **extra):
+    if _timings() is not None:
+        g.setdefault('metrics_rendering', []).append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    rendering = g.get('metrics_rendering') if has_request_context() else None
+    if rendering:
+        record('tpl', time.perf_counter() - rendering.pop())
@@ -1,6 +1,9 @@
 from datetime import datetime
 from app import db, login
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attribute_keyed_dict
+from sqlalchemy.orm.util import identity_key
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(UserMixin, db.Model):
@@ -9,6 +12,7 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), index=True, unique=True)
     password_hash = db.Column(db.String(128))
     is_admin = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Profile fields
     headline = db.Column(db.String(140))
@@ -148,6 +152,15 @@ class Decision(db.Model):
         }
     }
 
+    # Feed queries: a user's own decisions, and public decisions optionally
+    # filtered by category or stage, newest first
+    __table_args__ = (
+        db.Index('ix_decision_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_decision_is_public_created_at', 'is_public', 'created_at'),
+        db.Index('ix_decision_is_public_category_created_at', 'is_public', 'category', 'created_at'),
+        db.Index('ix_decision_is_public_stage_created_at', 'is_public', 'stage', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140))
     deadline = db.Column(db.DateTime)
@@ -155,41 +168,62 @@ class Decision(db.Model):
     status = db.Column(db.String(20), default='open') # open, closed
     stage = db.Column(db.String(40), default='1_trigger')
     category = db.Column(db.String(50))
+    category_status = db.Column(db.String(20), default='done') # pending, done, failed
     is_public = db.Column(db.Boolean, default=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    # Both move on every write to the decision or its children (see bump_decision_versions)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Content for each stage
-    stage_1_trigger = db.Column(db.Text)
-    stage_2_framing = db.Column(db.Text)
-    stage_3_objectives = db.Column(db.Text)
-    stage_4_options = db.Column(db.Text)
-    stage_5_information = db.Column(db.Text)
-    stage_6_evaluation = db.Column(db.Text)
-    stage_7_emotions = db.Column(db.Text)
-    stage_8_commitment = db.Column(db.Text)
-    stage_9_execution = db.Column(db.Text)
-    stage_10_review = db.Column(db.Text)
+    # Stage bodies live in DecisionStageContent and are only loaded when used
+    stage_contents = db.relationship('DecisionStageContent', backref='decision',
+                                     collection_class=attribute_keyed_dict('stage_key'),
+                                     cascade="all, delete-orphan")
 
     options = db.relationship('Option', backref='decision', lazy='dynamic', cascade="all, delete-orphan")
     suggestions = db.relationship('Suggestion', backref='decision', lazy='dynamic', cascade="all, delete-orphan")
     clarifications = db.relationship('Clarification', backref='decision', lazy='dynamic', cascade="all, delete-orphan")
     stage_suggestions = db.relationship('StageSuggestion', backref='decision', lazy='dynamic', cascade="all, delete-orphan")
 
+    def get_stage_content(self, stage_key):
+        stage_content = self.stage_contents.get(stage_key)
+        return stage_content.content if stage_content else None
+
+    def set_stage_content(self, stage_key, content):
+        if not content:
+            self.stage_contents.pop(stage_key, None)
+        elif stage_key in self.stage_contents:
+            self.stage_contents[stage_key].content = content
+        else:
+            self.stage_contents[stage_key] = DecisionStageContent(stage_key=stage_key, content=content)
+
     def __repr__(self):
         return f'<Decision {self.title}>'
 
+class DecisionStageContent(db.Model):
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'), primary_key=True)
+    stage_key = db.Column(db.String(40), primary_key=True) # e.g., '1_trigger'
+    content = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<DecisionStageContent {self.stage_key} for Decision {self.decision_id}>'
+
 class Option(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140))
     description = db.Column(db.Text)
     pros = db.Column(db.Text)
     cons = db.Column(db.Text)
-    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id'))
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'), index=True)
 
     def __repr__(self):
         return f'<Option {self.title}>'
 
 class Suggestion(db.Model):
+    __table_args__ = (
+        db.Index('ix_suggestion_decision_id_status', 'decision_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140))
     description = db.Column(db.Text)
@@ -197,8 +231,8 @@ class Suggestion(db.Model):
     cons = db.Column(db.Text)
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     status = db.Column(db.String(20), default='pending') # pending, accepted, ignored
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'))
     
     author = db.relationship('User', backref='suggestions')
 
@@ -206,12 +240,16 @@ class Suggestion(db.Model):
         return f'<Suggestion {self.title}>'
 
 class Clarification(db.Model):
+    __table_args__ = (
+        db.Index('ix_clarification_decision_id_status', 'decision_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.Text)
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     status = db.Column(db.String(20), default='pending') # pending, ignored
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'))
 
     author = db.relationship('User', backref='clarifications')
 
@@ -219,10 +257,15 @@ class Clarification(db.Model):
         return f'<Clarification {self.message[:20]}>'
 
 class UserAction(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_action_user_id_action_type', 'user_id', 'action_type'),
+        db.Index('ix_user_action_decision_id_action_type', 'decision_id', 'action_type'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
     action_type = db.Column(db.String(50)) # asked, read, clarification, suggestion, stage_suggestion
-    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id'))
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='SET NULL'))
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
 
     user = db.relationship('User', backref='actions')
@@ -231,20 +274,107 @@ class UserAction(db.Model):
     def __repr__(self):
         return f'<UserAction {self.action_type} by User {self.user_id} on Decision {self.decision_id}>'
 
+class UserActivityDaily(db.Model):
+    # Rollup of UserAction: one row per user, action type and day
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    action_type = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    user = db.relationship('User', backref=db.backref('activity_rollups', lazy='dynamic', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<UserActivityDaily {self.action_type} by User {self.user_id} on {self.day}: {self.count}>'
+
+class DecisionActivityDaily(db.Model):
+    # Rollup of UserAction: one row per decision, action type and day
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'), primary_key=True)
+    action_type = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    decision = db.relationship('Decision', backref=db.backref('activity_rollups', lazy='dynamic', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<DecisionActivityDaily {self.action_type} on Decision {self.decision_id} on {self.day}: {self.count}>'
+
+class CategoryFacet(db.Model):
+    # Decisions per category and visibility, kept in step by app/facets.py
+    category = db.Column(db.String(50), primary_key=True)
+    is_public = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CategoryFacet {self.category} public={self.is_public}: {self.count}>'
+
 class StageSuggestion(db.Model):
+    __table_args__ = (
+        db.Index('ix_stage_suggestion_decision_id_status', 'decision_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     stage_key = db.Column(db.String(40)) # e.g., '1_trigger'
     content = db.Column(db.Text)
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     status = db.Column(db.String(20), default='pending') # pending, accepted, ignored
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    decision_id = db.Column(db.Integer, db.ForeignKey('decision.id', ondelete='CASCADE'))
     
     author = db.relationship('User', backref='stage_suggestions')
 
     def __repr__(self):
         return f'<StageSuggestion {self.stage_key} for Decision {self.decision_id}>'
 
+class AIResponse(db.Model):
+    # Persistent tier of the AI response cache (see app/cache.py)
+    key = db.Column(db.String(64), primary_key=True) # sha256 of provider, model and normalized prompt
+    provider = db.Column(db.String(20))
+    model = db.Column(db.String(64))
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f'<AIResponse {self.key[:12]} from {self.provider}/{self.model}>'
+
+# Writes to these bump their decision's version and updated_at, which drives
+# the fragment cache (app/fragments.py) and the pages' ETags (app/conditional.py)
+VERSIONED_MODELS = (Decision, DecisionStageContent, Option, Suggestion, Clarification, StageSuggestion)
+
+def _changed_decision_ids(session):
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, VERSIONED_MODELS):
+            continue
+        if isinstance(obj, Decision):
+            # New decisions start at version 1; deleted ones have nothing left to version
+            if obj in session.new or obj in session.deleted or not session.is_modified(obj):
+                continue
+            ids.add(obj.id)
+        elif obj in session.new or obj in session.deleted or session.is_modified(obj):
+            if obj.decision_id is not None:
+                ids.add(obj.decision_id)
+    return ids
+
+@event.listens_for(Session, 'after_flush')
+def bump_decision_versions(session, flush_context):
+    ids = _changed_decision_ids(session)
+    if not ids:
+        return
+    table = Decision.__table__
+    session.connection().execute(
+        table.update().where(table.c.id.in_(ids))
+        .values(version=table.c.version + 1, updated_at=datetime.utcnow()))
+    session.info.setdefault('bumped_decisions', set()).update(ids)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def expire_decision_versions(session, flush_context):
+    # The UPDATE above bypassed the ORM, so reload the columns on next access
+    for decision_id in session.info.pop('bumped_decisions', ()):
+        decision = session.identity_map.get(identity_key(Decision, decision_id))
+        if decision is not None:
+            session.expire(decision, ['version', 'updated_at'])
+
 @login.user_loader
 def load_user(id):
     return User.query.get(int(id))
@@ -0,0 +1,202 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+from app.analytics import admin_user_stats
+from app.models import User, Decision
+from app.queries import (keyset_page, encode_cursor, user_feed_query, public_feed_query,
+                         profile_feed_query, pending_counts_for, pending_totals_for_owner,
+                         decisions_changed_for_owner, authors_changed_for_decision)
+from app.search import search_index
+
+# The queries behind the busiest pages, as (name, callable(user, decision)).
+# Each callable runs the same helpers the routes use.
+HOT_PATHS = [
+    ('index: my decisions', lambda user, decision: keyset_page(user_feed_query(user))),
+    ('index: my decisions by category', lambda user, decision: keyset_page(user_feed_query(user, category='Career'))),
+    ('index: my decisions by stage', lambda user, decision: keyset_page(user_feed_query(user, stage='1_trigger'))),
+    ('index: public decisions', lambda user, decision: keyset_page(public_feed_query(user.id))),
+    ('index: public decisions by category', lambda user, decision: keyset_page(public_feed_query(user.id, category='Career'))),
+    ('index: public decisions by stage', lambda user, decision: keyset_page(public_feed_query(user.id, stage='1_trigger'))),
+    ('index: public decisions, next page',
+     lambda user, decision: keyset_page(public_feed_query(user.id), cursor=encode_cursor(decision))),
+    ('index: pending counts', lambda user, decision: pending_counts_for([decision.id])),
+    ('index: pending totals', lambda user, decision: pending_totals_for_owner(user.id)),
+    ('user: profile decisions', lambda user, decision: keyset_page(profile_feed_query(user))),
+    ('user: etag', lambda user, decision: decisions_changed_for_owner(user.id)),
+    ('view_decision: etag', lambda user, decision: authors_changed_for_decision(decision.id)),
+    ('view_decision: options', lambda user, decision: decision.options.all()),
+    ('view_decision: pending stage suggestions',
+     lambda user, decision: decision.stage_suggestions.filter_by(stage_key='1_trigger', status='pending').all()),
+    ('view_decision: pending clarifications',
+     lambda user, decision: decision.clarifications.filter_by(status='pending').all()),
+    ('admin: user stats', lambda user, decision: admin_user_stats([user.id])),
+    ('search', lambda user, decision: search_index.search(Decision.query, 'decision')),
+]
+
+SCAN_RE = re.compile(r'^SCAN (?P<name>\w+)(?P<rest>.*)$')
+
+
+@contextmanager
+def capture_statements(connection):
+    """Collect (statement, parameters) for everything executed on connection."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(connection, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, 'before_cursor_execute', before_cursor_execute)
+
+
+def full_scans(plan, tables):
+    """Table names that a SQLite query plan reads without an index."""
+    scans = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        if not match or 'USING' in match.group('rest') or 'VIRTUAL TABLE' in match.group('rest'):
+            continue
+        # Aliases look like user_1; subqueries and CTEs aren't tables
+        name = re.sub(r'_\d+$', '', match.group('name'))
+        if name in tables or match.group('name') in tables:
+            scans.append(match.group('name'))
+    return scans
+
+
+def explain_hot_paths():
+    """Run every hot path against throwaway rows and return, per path, the
+    query plans of its statements and any full table scans in them.
+
+    Only SQLite's EXPLAIN QUERY PLAN output is understood.
+    """
+    tables = set(db.metadata.tables)
+    results = []
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        raise RuntimeError('Query plan checks need an SQLite database')
+    try:
+        user = User(username='__explain__', email='__explain__@example.invalid')
+        decision = Decision(title='Explain decision', owner=user, category='Career', is_public=True)
+        db.session.add_all([user, decision])
+        db.session.flush()
+
+        for name, run in HOT_PATHS:
+            with capture_statements(connection) as statements:
+                run(user, decision)
+            queries = []
+            for statement, parameters in statements:
+                plan = [row[-1] for row in connection.exec_driver_sql(
+                    f'EXPLAIN QUERY PLAN {statement}', parameters)]
+                queries.append({'sql': statement, 'plan': plan, 'full_scans': full_scans(plan, tables)})
+            results.append({'name': name, 'queries': queries,
+                            'ok': all(not query['full_scans'] for query in queries)})
+    finally:
+        db.session.rollback()
+    return results
+
+
+def _bench_engine(uri, config, tuned):
+    from sqlalchemy import create_engine
+    from app.engine import engine_options, apply_sqlite_pragmas, sqlite_pragmas
+    if not tuned:
+        return create_engine(uri)
+    engine = create_engine(uri, **engine_options(config))
+    apply_sqlite_pragmas(engine, sqlite_pragmas(config))
+    return engine
+
+
+def _bench_worker(uri, config, tuned, seconds, write_ratio, seed):
+    import random
+    import time
+    from sqlalchemy.exc import OperationalError
+    from app.models import Option, UserAction
+    engine = _bench_engine(uri, config, tuned)
+    with engine.connect() as connection:
+        decision_ids = [row[0] for row in connection.execute(db.select(Decision.id))]
+    user_id = 1
+    rng = random.Random(seed)
+    stats = {'reads': [], 'writes': [], 'errors': 0}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        decision_id = rng.choice(decision_ids)
+        write = rng.random() < write_ratio
+        started = time.perf_counter()
+        try:
+            if write:
+                # Like view_decision's read log and the suggestion endpoints: one small commit
+                with engine.begin() as connection:
+                    connection.execute(db.insert(UserAction).values(
+                        user_id=user_id, action_type='read', decision_id=decision_id))
+            else:
+                with engine.connect() as connection:
+                    connection.execute(db.select(Decision).where(Decision.id == decision_id)).all()
+                    connection.execute(db.select(Option).where(Option.decision_id == decision_id)).all()
+        except OperationalError:
+            stats['errors'] += 1
+            continue
+        stats['writes' if write else 'reads'].append(time.perf_counter() - started)
+    engine.dispose()
+    return stats
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def latency_stats(latencies, seconds):
+    """Count, throughput and p50/p95/p99 (in ms) of latencies in seconds."""
+    return {
+        'count': len(latencies),
+        'per_second': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run_bench(path, config, tuned=True, processes=4, seconds=5.0, write_ratio=0.2, decisions=1000):
+    """Hammer a scratch SQLite database at path from several processes with a
+    mix of single-decision reads and single-row write commits, and report
+    throughput, latency percentiles and lock errors."""
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    from sqlalchemy import create_engine
+    from app.models import Option
+    if os.path.exists(path):
+        os.remove(path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    uri = f'sqlite:///{path}'
+
+    seed_engine = create_engine(uri)
+    db.metadata.create_all(seed_engine)
+    with seed_engine.begin() as connection:
+        connection.execute(db.insert(User).values(id=1, username='bench', email='bench@example.invalid'))
+        connection.execute(db.insert(Decision), [
+            {'title': f'Bench decision {i}', 'user_id': 1, 'is_public': True} for i in range(decisions)])
+        connection.execute(db.insert(Option), [
+            {'title': f'Option {i}', 'decision_id': i % decisions + 1} for i in range(decisions * 3)])
+    seed_engine.dispose()
+
+    settings = {key: config[key] for key in config if key.startswith(('SQLITE_', 'DB_'))}
+    settings['SQLALCHEMY_DATABASE_URI'] = uri
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(_bench_worker, [uri] * processes, [settings] * processes,
+                                    [tuned] * processes, [seconds] * processes,
+                                    [write_ratio] * processes, range(processes)))
+
+    reads = [latency for result in results for latency in result['reads']]
+    writes = [latency for result in results for latency in result['writes']]
+    report = {'tuned': tuned, 'processes': processes, 'seconds': seconds,
+              'errors': sum(result['errors'] for result in results)}
+    for kind, latencies in (('reads', reads), ('writes', writes)):
+        report[kind] = latency_stats(latencies, seconds)
+    return report
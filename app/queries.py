@@ -0,0 +1,144 @@
+import base64
+from datetime import datetime
+from flask import url_for
+from app import db
+from app.models import User, Decision, Suggestion, StageSuggestion, Clarification
+
+
+def encode_cursor(decision):
+    raw = f"{decision.created_at.isoformat()}|{decision.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, decision_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(decision_id)
+    except (ValueError, UnicodeDecodeError):
+        # A malformed cursor just restarts the feed from the newest decision
+        return None
+
+
+def keyset_page(query, cursor=None, per_page=24):
+    """Return one page of decisions ordered by (created_at, id), newest first,
+    plus the cursor for the next page (None when the feed is exhausted)."""
+    position = decode_cursor(cursor)
+    if position:
+        created_at, decision_id = position
+        query = query.filter(db.or_(
+            Decision.created_at < created_at,
+            db.and_(Decision.created_at == created_at, Decision.id < decision_id)
+        ))
+    rows = query.order_by(Decision.created_at.desc(), Decision.id.desc()).limit(per_page + 1).all()
+    next_cursor = encode_cursor(rows[per_page - 1]) if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
+
+
+def listing_options():
+    # Every decision listing shows the owner's username, so load it with the row
+    return (db.joinedload(Decision.owner),)
+
+
+def decision_listing(query):
+    return query.options(*listing_options())
+
+
+def filter_decisions(query, category=None, stage=None):
+    if category:
+        query = query.filter(Decision.category == category)
+    if stage:
+        query = query.filter(Decision.stage == stage)
+    return query
+
+
+def user_feed_query(user, category=None, stage=None):
+    return filter_decisions(decision_listing(user.decisions), category, stage)
+
+
+def public_feed_query(exclude_user_id=None, category=None, stage=None):
+    query = decision_listing(Decision.query).filter(Decision.is_public == True)
+    if exclude_user_id is not None:
+        query = query.filter(Decision.user_id != exclude_user_id)
+    return filter_decisions(query, category, stage)
+
+
+def profile_feed_query(user, include_private=False):
+    query = decision_listing(user.decisions)
+    if not include_private:
+        query = query.filter(Decision.is_public == True)
+    return query
+
+
+def feed_row(decision, stage_labels):
+    return {
+        'title': decision.title,
+        'category': decision.category or 'Unspecified',
+        'stage': stage_labels.get(decision.stage, decision.stage),
+        'status': (decision.status or '').capitalize(),
+        'visibility': 'Public' if decision.is_public else 'Private',
+        'owner': decision.owner.username if decision.owner else '',
+        'created_at': decision.created_at.strftime('%Y-%m-%d'),
+        'link': url_for('main.view_decision', id=decision.id),
+    }
+
+
+PENDING_KINDS = ('suggestions', 'stage_suggestions', 'clarifications')
+
+
+def _pending_items(decision_ids):
+    # One row per pending item across the three review queues, tagged with its kind.
+    # The decision filter is applied inside every branch so each one can use its index.
+    return db.union_all(*[
+        db.select(model.decision_id, db.literal(kind).label('kind'))
+        .where(model.status == 'pending', model.decision_id.in_(decision_ids))
+        for kind, model in (('suggestions', Suggestion),
+                            ('stage_suggestions', StageSuggestion),
+                            ('clarifications', Clarification))
+    ]).subquery()
+
+
+def pending_counts_for(decision_ids):
+    """Pending suggestion, stage suggestion and clarification counts keyed by
+    decision id, computed with a single grouped query."""
+    counts = {decision_id: dict.fromkeys(PENDING_KINDS, 0) for decision_id in decision_ids}
+    if not counts:
+        return counts
+    items = _pending_items(list(counts))
+    rows = db.session.execute(
+        db.select(items.c.decision_id, items.c.kind, db.func.count())
+        .group_by(items.c.decision_id, items.c.kind)
+    )
+    for decision_id, kind, count in rows:
+        counts[decision_id][kind] = count
+    return counts
+
+
+def pending_totals_for_owner(user_id):
+    totals = dict.fromkeys(PENDING_KINDS, 0)
+    items = _pending_items(db.select(Decision.id).where(Decision.user_id == user_id))
+    rows = db.session.execute(
+        db.select(items.c.kind, db.func.count()).group_by(items.c.kind)
+    )
+    for kind, count in rows:
+        totals[kind] = count
+    return totals
+
+
+def authors_changed_for_decision(decision_id):
+    """Latest updated_at of the users named on a decision's page as authors
+    of its stage suggestions and clarifications; moves when one renames."""
+    author_ids = db.union(*[db.select(model.user_id).where(model.decision_id == decision_id)
+                            for model in (StageSuggestion, Clarification)])
+    return db.session.scalar(db.select(db.func.max(User.updated_at)).where(User.id.in_(author_ids)))
+
+
+def decisions_changed_for_owner(user_id):
+    """(count, latest updated_at) of a user's decisions; moves whenever any of
+    them is added, removed or changed."""
+    return db.session.execute(
+        db.select(db.func.count(Decision.id), db.func.max(Decision.updated_at))
+        .where(Decision.user_id == user_id)
+    ).one()
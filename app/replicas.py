@@ -0,0 +1,85 @@
+import random
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+REPLICA_BIND_PREFIX = 'replica_'
+# Flask session key holding the time until which this browser reads from the primary
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def configure(app):
+    """Register SQLALCHEMY_REPLICA_URIS as extra binds; call before db.init_app()."""
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+        key = f'{REPLICA_BIND_PREFIX}{index}'
+        binds[key] = uri
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['replicas'] = keys
+
+
+def read_only(view):
+    """Let the SELECTs of this view go to a read replica.
+
+    Writes made by the view still go to the primary, and so does everything
+    else in the request once it has written. For REPLICA_STICKY_SECONDS
+    after a commit, the same browser reads from the primary too, so it
+    sees its own writes despite replication lag.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _replica_key():
+    if not has_request_context() or not g.get('db_read_only'):
+        return None
+    keys = current_app.extensions.get('replicas')
+    if not keys or flask_session.get(STICKY_SESSION_KEY, 0) > time.time():
+        return None
+    # One replica per request, so its reads share a snapshot
+    if 'db_replica' not in g:
+        g.db_replica = random.choice(keys)
+    return g.db_replica
+
+
+class RoutingSession(BaseSession):
+    """db.session class that sends the SELECTs of read_only views to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not self.info.get('wrote')
+                and isinstance(clause, Select)):
+            key = _replica_key()
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_executed_write(orm_execute_state):
+    # Bulk UPDATE/DELETE statements write without a flush
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session):
+    if session.info.pop('wrote', False) and has_request_context() and current_app.extensions.get('replicas'):
+        flask_session[STICKY_SESSION_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('wrote', None)
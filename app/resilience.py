@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+import httpx
+from flask import current_app, has_request_context, request
+from werkzeug.local import LocalProxy
+from app.metrics import metrics
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+# The value of the ai_breaker_state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the AI provider while the breaker is open;
+    callers should go straight to their fallback."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'AI provider unavailable, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stops calling the AI provider after AI_BREAKER_THRESHOLD consecutive
+    transient failures (timeouts, connection errors, 429 and 5xx responses).
+
+    While open, calls fail at once with CircuitOpenError. After
+    AI_BREAKER_RESET_TIMEOUT seconds a single trial call is let through
+    (half-open): success closes the breaker, failure opens it again. Each
+    app has its own breaker, per process and shared by its threads.
+    """
+
+    def __init__(self, app=None):
+        self.threshold = 5
+        self.reset_timeout = 30.0
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.threshold = app.config['AI_BREAKER_THRESHOLD']
+        self.reset_timeout = app.config['AI_BREAKER_RESET_TIMEOUT']
+        self.reset()
+        app.extensions['ai_breaker'] = self
+        app.extensions['metrics'].gauge('ai_breaker_state', lambda: STATE_VALUES[self.state])
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now. A call let
+        through must be followed by record_success or record_failure."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                retry_after = self._opened_at + self.reset_timeout - now
+                if retry_after > 0:
+                    raise CircuitOpenError(retry_after)
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial:
+                    # Someone else's trial call is still running
+                    raise CircuitOpenError(self.reset_timeout)
+                self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and self._opened_at + self.reset_timeout > time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._trial = False
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.increment('ai_breaker_transitions_total', state=state)
+        current_app.logger.warning(f"AI circuit breaker {state.replace('_', '-')}")
+
+
+# The current app's CircuitBreaker; create_app gives every app its own
+breaker = LocalProxy(lambda: current_app.extensions['ai_breaker'])
+
+
+def is_transient(error):
+    """Whether error says the provider is struggling rather than that the
+    request was wrong, so it is worth retrying and counts against the breaker."""
+    from openai import APIConnectionError
+    # APITimeoutError is an APIConnectionError; httpx errors escape from streams
+    if isinstance(error, (APIConnectionError, httpx.TransportError, TimeoutError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _outcome(error):
+    from openai import APITimeoutError
+    if isinstance(error, (APITimeoutError, httpx.TimeoutException, TimeoutError)):
+        return 'timeout'
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return str(status)
+    return 'connection_error' if is_transient(error) else 'error'
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def record_attempt(started, error=None):
+    """Count a finished call attempt and report it to the breaker."""
+    endpoint = request.endpoint if has_request_context() and request.endpoint else 'background'
+    metrics.observe('ai_call_duration_seconds', endpoint, time.monotonic() - started)
+    metrics.increment('ai_calls_total', endpoint=endpoint, outcome='ok' if error is None else _outcome(error))
+    if error is not None and is_transient(error):
+        breaker.record_failure()
+    else:
+        # Any answer, even a refusal of a bad request, shows the provider is up
+        breaker.record_success()
+
+
+def call_with_retries(attempt, deadline, retries=None):
+    """Return attempt(timeout), retrying transient failures with full-jitter
+    exponential backoff for as long as deadline (seconds from now) allows.
+
+    Each attempt is given the time left, capped at AI_TIMEOUT, as its
+    timeout. Every attempt asks the breaker first, so an open breaker ends
+    the retries with CircuitOpenError.
+    """
+    config = current_app.config
+    retries = config['AI_MAX_RETRIES'] if retries is None else retries
+    expires_at = time.monotonic() + deadline
+    endpoint = request.endpoint if has_request_context() and request.endpoint else 'background'
+    for number in range(retries + 1):
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            metrics.increment('ai_calls_total', endpoint=endpoint, outcome='rejected')
+            raise
+        started = time.monotonic()
+        try:
+            result = attempt(min(config['AI_TIMEOUT'], expires_at - started))
+        except Exception as e:
+            record_attempt(started, e)
+            if not is_transient(e) or number == retries:
+                raise
+            delay = max(random.uniform(0, min(config['AI_RETRY_BACKOFF_MAX'],
+                                              config['AI_RETRY_BACKOFF'] * 2 ** number)),
+                        _retry_after(e) or 0)
+            # Not worth another try without time for it to answer
+            if time.monotonic() + delay + config['AI_MIN_ATTEMPT_TIME'] > expires_at:
+                raise
+            metrics.increment('ai_retries_total')
+            time.sleep(delay)
+        else:
+            record_attempt(started)
+            return result
@@ -1,11 +1,25 @@
-from flask import Blueprint, render_template, abort, flash, redirect, url_for, request, jsonify, current_app
+from flask import Blueprint, render_template, abort, flash, redirect, url_for, request, jsonify, current_app, Response, stream_with_context, send_file, get_template_attribute
 from flask_login import login_required, current_user
-from app import db
+from app import db, ai
 from app.models import User, Decision, Option, Suggestion, Clarification, UserAction, StageSuggestion
 from app.forms import DecisionForm, OptionForm, SuggestionForm, ClarificationForm, EditProfileForm
-from app.utils import categorize_decision
+from app.analytics import admin_user_stats
+from app.bulk import delete_decisions, delete_users
+from app.blobs import blob_store, extract_inline_images, MIME_TYPES
+from app.events import action_buffer
+from app.facets import category_facets
+from app.fragments import fragment_cache, decision_fragment_key
+from app.metrics import metrics
+from app.conditional import conditional, make_etag, latest
+from app.search import search_index
+from app.tasks import categorizer, FALLBACK_CATEGORY
+from app.replicas import read_only
+from app.queries import (keyset_page, decision_listing, user_feed_query, public_feed_query,
+                         profile_feed_query, feed_row, pending_counts_for, pending_totals_for_owner,
+                         decisions_changed_for_owner, authors_changed_for_decision)
 import json
 import os
+import re
 import subprocess
 from hmac import compare_digest
 
@@ -51,66 +65,105 @@ def deploy_webhook_root():
 
 @bp.route('/')
 @bp.route('/index')
+@read_only
 def index():
     selected_category = request.args.get('category')
     selected_stage = request.args.get('stage')
     valid_stages = {stage_key for stage_key, _ in Decision.STAGES}
     if selected_stage not in valid_stages:
         selected_stage = None
+    per_page = current_app.config['DECISIONS_PER_PAGE']
+    public_cursor = request.args.get('public_cursor')
 
-    categories = db.session.query(Decision.category).filter(Decision.category != None).distinct().all()
-    categories = [c[0] for c in categories if c[0]]
+    # [(category, public_count, private_count)], maintained on write and cached briefly
+    categories = category_facets.get()
     
     if current_user.is_authenticated:
-        user_query = current_user.decisions
-        public_query = Decision.query.filter(Decision.is_public == True, Decision.user_id != current_user.id)
+        mine_cursor = request.args.get('mine_cursor')
+        user_query = user_feed_query(current_user, selected_category, selected_stage)
+        public_query = public_feed_query(current_user.id, selected_category, selected_stage)
         
         # Check for pending actions on current user's decisions
-        pending_suggestions_count = Suggestion.query.join(Decision).filter(
-            Decision.user_id == current_user.id,
-            Suggestion.status == 'pending'
-        ).count()
-        
-        pending_stage_suggestions_count = StageSuggestion.query.join(Decision).filter(
-            Decision.user_id == current_user.id,
-            StageSuggestion.status == 'pending'
-        ).count()
-        
-        pending_clarifications = Clarification.query.join(Decision).filter(
-            Decision.user_id == current_user.id,
-            Clarification.status == 'pending'
-        ).count()
-        
-        if selected_category:
-            user_query = user_query.filter(Decision.category == selected_category)
-            public_query = public_query.filter(Decision.category == selected_category)
-        if selected_stage:
-            user_query = user_query.filter(Decision.stage == selected_stage)
-            public_query = public_query.filter(Decision.stage == selected_stage)
+        pending_totals = pending_totals_for_owner(current_user.id)
             
-        user_decisions = user_query.order_by(Decision.created_at.desc()).all()
-        public_decisions = public_query.order_by(Decision.created_at.desc()).all()
+        user_decisions, next_mine_cursor = keyset_page(user_query, mine_cursor, per_page)
+        public_decisions, next_public_cursor = keyset_page(public_query, public_cursor, per_page)
+        pending_counts = pending_counts_for([d.id for d in user_decisions])
         
         return render_template('index.html', title='Home', decisions=user_decisions, 
                                public_decisions=public_decisions, categories=categories,
                                selected_category=selected_category,
                                selected_stage=selected_stage,
                                stages=Decision.STAGES,
-                               pending_suggestions=pending_suggestions_count + pending_stage_suggestions_count,
-                               pending_clarifications=pending_clarifications)
+                               mine_cursor=mine_cursor,
+                               public_cursor=public_cursor,
+                               next_mine_cursor=next_mine_cursor,
+                               next_public_cursor=next_public_cursor,
+                               pending_counts=pending_counts,
+                               pending_suggestions=pending_totals['suggestions'] + pending_totals['stage_suggestions'],
+                               pending_clarifications=pending_totals['clarifications'])
     
     # For non-authenticated users, we show public decisions
-    public_query = Decision.query.filter(Decision.is_public == True)
-    if selected_category:
-        public_query = public_query.filter(Decision.category == selected_category)
-    if selected_stage:
-        public_query = public_query.filter(Decision.stage == selected_stage)
-    
-    public_decisions = public_query.order_by(Decision.created_at.desc()).all()
+    public_query = public_feed_query(category=selected_category, stage=selected_stage)
+    public_decisions, next_public_cursor = keyset_page(public_query, public_cursor, per_page)
         
     return render_template('index.html', title='Home', categories=categories, 
                            public_decisions=public_decisions, selected_category=selected_category,
-                           selected_stage=selected_stage, stages=Decision.STAGES)
+                           selected_stage=selected_stage, stages=Decision.STAGES,
+                           public_cursor=public_cursor,
+                           next_public_cursor=next_public_cursor)
+
+@bp.route('/decisions/feed')
+@read_only
+def decision_feed():
+    # Paged JSON rows for the AG-Grid views on the home page
+    scope = request.args.get('scope', 'public')
+    selected_category = request.args.get('category')
+    selected_stage = request.args.get('stage')
+    if selected_stage not in {stage_key for stage_key, _ in Decision.STAGES}:
+        selected_stage = None
+
+    if scope == 'mine':
+        if not current_user.is_authenticated:
+            return jsonify({"error": "Login required"}), 401
+        query = user_feed_query(current_user, selected_category, selected_stage)
+    elif scope == 'public':
+        exclude_user_id = current_user.id if current_user.is_authenticated else None
+        query = public_feed_query(exclude_user_id, selected_category, selected_stage)
+    else:
+        return jsonify({"error": "Invalid scope"}), 400
+
+    per_page = min(request.args.get('per_page', current_app.config['DECISIONS_PER_PAGE'], type=int),
+                   current_app.config['DECISIONS_FEED_MAX_PER_PAGE'])
+    decisions, next_cursor = keyset_page(query, request.args.get('cursor'), max(per_page, 1))
+    etag = make_etag('feed', next_cursor, [(d.id, d.version, d.owner and d.owner.updated_at) for d in decisions])
+    last_modified = latest(*[d.updated_at for d in decisions])
+    stage_labels = dict(Decision.STAGES)
+    return conditional(etag, last_modified, lambda: jsonify({
+        "rows": [feed_row(d, stage_labels) for d in decisions],
+        "next_cursor": next_cursor
+    }))
+
+@bp.route('/search')
+@read_only
+def search():
+    # Ranked, paged full-text search over the decisions the user can see
+    query = Decision.query
+    if not current_user.is_authenticated:
+        query = query.filter(Decision.is_public == True)
+    elif not current_user.is_admin:
+        query = query.filter(db.or_(Decision.is_public == True, Decision.user_id == current_user.id))
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(request.args.get('per_page', current_app.config['DECISIONS_PER_PAGE'], type=int),
+                   current_app.config['DECISIONS_FEED_MAX_PER_PAGE'])
+    decisions, has_next = search_index.search(query, request.args.get('q', ''), page, max(per_page, 1))
+    stage_labels = dict(Decision.STAGES)
+    return jsonify({
+        "rows": [feed_row(d, stage_labels) for d in decisions],
+        "page": page,
+        "next_page": page + 1 if has_next else None
+    })
 
 @bp.route('/decision/new', methods=['GET', 'POST'])
 @login_required
@@ -123,19 +176,12 @@ def new_decision():
                             owner=current_user)
         
         # Populate stage content
-        decision.stage_1_trigger = form.stage_1_trigger.data
-        decision.stage_2_framing = form.stage_2_framing.data
-        decision.stage_3_objectives = form.stage_3_objectives.data
-        decision.stage_4_options = form.stage_4_options.data
-        decision.stage_5_information = form.stage_5_information.data
-        decision.stage_6_evaluation = form.stage_6_evaluation.data
-        decision.stage_7_emotions = form.stage_7_emotions.data
-        decision.stage_8_commitment = form.stage_8_commitment.data
-        decision.stage_9_execution = form.stage_9_execution.data
-        decision.stage_10_review = form.stage_10_review.data
+        for stage_key, _ in Decision.STAGES:
+            decision.set_stage_content(stage_key, extract_inline_images(form[f'stage_{stage_key}'].data))
         
-        # Categorize decision using AI
-        decision.category = categorize_decision(decision)
+        # Save with a provisional category; the AI category is filled in in the background
+        decision.category = FALLBACK_CATEGORY
+        decision.category_status = 'pending'
         
         db.session.add(decision)
         db.session.commit()
@@ -145,32 +191,80 @@ def new_decision():
         db.session.add(action)
         db.session.commit()
 
+        categorizer.submit(decision.id)
+
         flash('Your decision process has been started!')
         return redirect(url_for('main.view_decision', id=decision.id))
     return render_template('create_decision.html', title='New Decision', form=form,
                            stage_details=Decision.STAGE_DETAILS)
 @bp.route('/decision/<int:id>')
+@read_only
 def view_decision(id):
     decision = Decision.query.get_or_404(id)
     if not decision.is_public:
         if current_user.is_anonymous or decision.owner != current_user:
             abort(403)
     
-    # Log read action for authenticated users
+    # Log read action for authenticated users; buffered so the page stays a pure read
     if current_user.is_authenticated:
-        action = UserAction(user_id=current_user.id, action_type='read', decision_id=decision.id)
-        db.session.add(action)
-        db.session.commit()
-
-    option_form = OptionForm()
-    suggestion_form = SuggestionForm()
-    clarification_form = ClarificationForm()
-    return render_template('view_decision.html', title=decision.title, 
-                           decision=decision, option_form=option_form, 
-                           suggestion_form=suggestion_form,
-                           clarification_form=clarification_form,
-                           stages=Decision.STAGES,
-                           stage_details=Decision.STAGE_DETAILS)
+        action_buffer.record(current_user.id, 'read', decision.id)
+
+    owner = decision.owner
+    # The page also shows the usernames of suggestion and clarification authors
+    authors_changed = authors_changed_for_decision(decision.id)
+    etag = make_etag('decision', decision.id, decision.version, owner and (owner.id, owner.updated_at),
+                     authors_changed)
+    last_modified = latest(decision.updated_at, owner and owner.updated_at, authors_changed)
+
+    def render():
+        return render_template('view_decision.html', title=decision.title,
+                               decision=decision, option_form=OptionForm(),
+                               suggestion_form=SuggestionForm(),
+                               clarification_form=ClarificationForm(),
+                               stages=Decision.STAGES,
+                               stage_panels=_stage_panels(decision))
+    return conditional(etag, last_modified, render)
+
+def _stage_panels(decision):
+    # The viewer-independent parts of each stage, rendered once per decision version
+    def render():
+        header = get_template_attribute('_stage_panels.html', 'stage_header')
+        guidance = get_template_attribute('_stage_panels.html', 'stage_guidance')
+        body = get_template_attribute('_stage_panels.html', 'stage_body')
+        panels = {}
+        for value, label in Decision.STAGES:
+            stage_content = decision.get_stage_content(value)
+            panels[value] = {
+                'has_content': bool(stage_content),
+                'header': str(header(decision, value, label, value.split('_')[0], stage_content)),
+                'guidance': str(guidance(Decision.STAGE_DETAILS.get(value))),
+                'body': str(body(value, stage_content)),
+            }
+        return panels
+    return fragment_cache.get_or_render(decision_fragment_key('stages', decision), render)
+
+@bp.route('/decision/<int:id>/category_status')
+@read_only
+def category_status(id):
+    decision = Decision.query.get_or_404(id)
+    if not decision.is_public:
+        if current_user.is_anonymous or decision.owner != current_user:
+            abort(403)
+    return jsonify({"status": decision.category_status or 'done', "category": decision.category})
+
+@bp.route('/blobs/<digest>.<ext>')
+def blob(digest, ext):
+    if not re.fullmatch(r'[0-9a-f]{64}', digest) or ext not in MIME_TYPES:
+        abort(404)
+    path = blob_store.path(digest, ext)
+    if not os.path.exists(path):
+        abort(404)
+    # Blobs are addressed by their content hash, so they can be cached forever
+    response = send_file(path, mimetype=MIME_TYPES[ext], etag=digest, conditional=True,
+                         max_age=365 * 24 * 3600)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @bp.route('/decision/<int:id>/update_stage_content', methods=['POST'])
 @login_required
@@ -183,9 +277,8 @@ def update_stage_content(id):
     stage_key = data.get('stage_key')
     content = data.get('content')
     
-    stage_attr = f"stage_{stage_key}"
-    if hasattr(decision, stage_attr):
-        setattr(decision, stage_attr, content)
+    if stage_key in dict(Decision.STAGES):
+        decision.set_stage_content(stage_key, extract_inline_images(content))
         db.session.commit()
         return jsonify({"success": True})
     
@@ -204,7 +297,7 @@ def suggest_stage_content(id):
     
     suggestion = StageSuggestion(
         stage_key=stage_key,
-        content=content,
+        content=extract_inline_images(content),
         author=current_user,
         decision=decision
     )
@@ -239,17 +332,7 @@ def set_current_stage(id):
     
     return redirect(url_for('main.view_decision', id=id))
 
-@bp.route('/decision/<int:id>/ai_assist_stage', methods=['POST'])
-@login_required
-def ai_assist_stage(id):
-    decision = Decision.query.get_or_404(id)
-    if decision.owner != current_user and not current_user.is_admin:
-        return jsonify({"error": "Unauthorized"}), 403
-    
-    data = request.get_json()
-    stage_key = data.get('stage_key')
-    current_content = data.get('content', '')
-    
+def _stage_assist_prompt(decision, stage_key, current_content):
     # Find stage label
     stage_label = ""
     for k, v in Decision.STAGES:
@@ -261,65 +344,96 @@ def ai_assist_stage(id):
     other_stages_context = ""
     for k, v in Decision.STAGES:
         if k != stage_key:
-            stage_content = getattr(decision, f"stage_{k}")
+            stage_content = decision.get_stage_content(k)
             if stage_content and stage_content.strip() and stage_content != '<p><br></p>':
                 # Strip HTML for the prompt to keep it cleaner
                 from markupsafe import Markup
                 clean_content = Markup(stage_content).striptags()
                 other_stages_context += f"Stage {v}: {clean_content[:500]}...\n" if len(clean_content) > 500 else f"Stage {v}: {clean_content}\n"
 
-    api_key = current_app.config.get('AI_API_KEY')
-    provider = current_app.config.get('AI_PROVIDER')
-    base_url = current_app.config.get('AI_BASE_URL')
+    return f"""
+    As an expert decision-making coach, help the user refine and expand their thinking for the following stage of their decision process.
+    
+    DECISION CONTEXT:
+    Main Decision: {decision.title}
+    
+    OTHER STAGES CONTEXT (to ensure consistency):
+    {other_stages_context if other_stages_context else "No content in other stages yet."}
+    
+    CURRENT STAGE TO IMPROVE: {stage_label}
+    
+    USER'S CURRENT CONTENT FOR THIS STAGE:
+    {current_content if current_content else "(Empty)"}
+    
+    INSTRUCTIONS:
+    1. Analyze the main decision, the context from other stages, and the current content provided for this specific stage.
+    2. Provide a personalized, detailed, and highly relevant expansion or improvement that builds upon the user's current thinking.
+    3. Ensure your suggestion is consistent with the information provided in other stages.
+    4. Do NOT provide generic advice. Be specific to "{decision.title}".
+    5. If the current content is empty, generate a strong starting point based on the decision title, other stages context, and stage requirements.
+    6. If there is existing content, maintain its core intent while improving clarity, depth, and structure.
+    
+    Format your response using HTML (e.g., <p>, <ul>, <li>, <strong>) for better readability.
+    Return ONLY the improved text content.
+    """
+
+@bp.route('/decision/<int:id>/ai_assist_stage', methods=['POST'])
+@login_required
+def ai_assist_stage(id):
+    decision = Decision.query.get_or_404(id)
+    if decision.owner != current_user and not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    data = request.get_json()
+    prompt = _stage_assist_prompt(decision, data.get('stage_key'), data.get('content', ''))
 
-    if api_key:
+    if ai.is_configured():
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=api_key, base_url=base_url)
-            
-            model = "gpt-3.5-turbo"
-            if provider == 'grok':
-                model = "grok-2-1212"
-            elif provider == 'groq':
-                model = "llama-3.3-70b-versatile"
-            
-            prompt = f"""
-            As an expert decision-making coach, help the user refine and expand their thinking for the following stage of their decision process.
-            
-            DECISION CONTEXT:
-            Main Decision: {decision.title}
-            
-            OTHER STAGES CONTEXT (to ensure consistency):
-            {other_stages_context if other_stages_context else "No content in other stages yet."}
-            
-            CURRENT STAGE TO IMPROVE: {stage_label}
-            
-            USER'S CURRENT CONTENT FOR THIS STAGE:
-            {current_content if current_content else "(Empty)"}
-            
-            INSTRUCTIONS:
-            1. Analyze the main decision, the context from other stages, and the current content provided for this specific stage.
-            2. Provide a personalized, detailed, and highly relevant expansion or improvement that builds upon the user's current thinking.
-            3. Ensure your suggestion is consistent with the information provided in other stages.
-            4. Do NOT provide generic advice. Be specific to "{decision.title}".
-            5. If the current content is empty, generate a strong starting point based on the decision title, other stages context, and stage requirements.
-            6. If there is existing content, maintain its core intent while improving clarity, depth, and structure.
-            
-            Format your response using HTML (e.g., <p>, <ul>, <li>, <strong>) for better readability.
-            Return ONLY the improved text content.
-            """
-            
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            ai_content = response.choices[0].message.content.strip()
+            ai_content = ai.complete(prompt).strip()
             return jsonify({"suggestion": ai_content})
+        except ai.CircuitOpenError as e:
+            return _ai_unavailable(e.retry_after)
         except Exception as e:
+            current_app.logger.warning(f"AI stage assist failed: {e}")
             return jsonify({"error": str(e)}), 500
     
     return jsonify({"error": "AI not configured"}), 501
 
+def _ai_unavailable(retry_after):
+    # The circuit breaker is open; the client can try again later
+    response = jsonify({"error": "The AI assistant is temporarily unavailable. Please try again shortly."})
+    response.headers['Retry-After'] = str(max(1, round(retry_after)))
+    return response, 503
+
+@bp.route('/decision/<int:id>/ai_assist_stage/stream', methods=['POST'])
+@login_required
+def ai_assist_stage_stream(id):
+    # Same as ai_assist_stage, but forwards the reply as Server-Sent Events while it is generated
+    decision = Decision.query.get_or_404(id)
+    if decision.owner != current_user and not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    if not ai.is_configured():
+        return jsonify({"error": "AI not configured"}), 501
+    if ai.breaker.is_open():
+        return _ai_unavailable(ai.breaker.reset_timeout)
+
+    data = request.get_json()
+    prompt = _stage_assist_prompt(decision, data.get('stage_key'), data.get('content', ''))
+    # Don't hold a database connection for the length of the stream
+    db.session.rollback()
+
+    def events():
+        try:
+            # Closing this generator (the client went away) closes the upstream stream too
+            for delta in ai.stream(prompt):
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @bp.route('/stage_suggestion/<int:id>/accept', methods=['POST'])
 @login_required
 def accept_stage_suggestion(id):
@@ -327,15 +441,14 @@ def accept_stage_suggestion(id):
     if suggestion.decision.owner != current_user and not current_user.is_admin:
         abort(403)
     
-    stage_attr = f"stage_{suggestion.stage_key}"
-    if hasattr(suggestion.decision, stage_attr):
-        current_content = getattr(suggestion.decision, stage_attr)
+    if suggestion.stage_key in dict(Decision.STAGES):
+        current_content = suggestion.decision.get_stage_content(suggestion.stage_key)
         if current_content and current_content.strip() and current_content != '<p><br></p>':
             # Merge with a separator
             merged_content = f"{current_content}<hr><p><strong>Suggestion from {suggestion.author.username}:</strong></p>{suggestion.content}"
-            setattr(suggestion.decision, stage_attr, merged_content)
+            suggestion.decision.set_stage_content(suggestion.stage_key, extract_inline_images(merged_content))
         else:
-            setattr(suggestion.decision, stage_attr, suggestion.content)
+            suggestion.decision.set_stage_content(suggestion.stage_key, extract_inline_images(suggestion.content))
         
         suggestion.status = 'accepted'
         db.session.commit()
@@ -363,54 +476,37 @@ def suggest_options(id):
     if decision.owner != current_user:
         abort(403)
     
-    api_key = current_app.config.get('AI_API_KEY')
-    provider = current_app.config.get('AI_PROVIDER')
-    base_url = current_app.config.get('AI_BASE_URL')
-
-    if api_key:
+    if ai.is_configured():
         try:
-            if provider in ['openai', 'grok', 'groq']:
-                from openai import OpenAI
-                client = OpenAI(api_key=api_key, base_url=base_url)
-                
-                model = "gpt-3.5-turbo"
-                if provider == 'grok':
-                    model = "grok-2-1212"
-                elif provider == 'groq':
-                    model = "llama-3.3-70b-versatile"
-                
-                prompt = f"""
-                As an expert decision-making assistant, provide 3 creative and distinct alternative options for the following decision.
-                Base your suggestions heavily on the title provided to ensure they are highly relevant.
-                
-                Decision Title: {decision.title}
-                
-                IMPORTANT: You must respond ONLY with a JSON object in the following format:
+            prompt = f"""
+            As an expert decision-making assistant, provide 3 creative and distinct alternative options for the following decision.
+            Base your suggestions heavily on the title provided to ensure they are highly relevant.
+            
+            Decision Title: {decision.title}
+            
+            IMPORTANT: You must respond ONLY with a JSON object in the following format:
+            {{
+              "suggestions": [
                 {{
-                  "suggestions": [
-                    {{
-                      "title": "string",
-                      "description": "string",
-                      "pros": "string",
-                      "cons": "string"
-                    }}
-                  ]
+                  "title": "string",
+                  "description": "string",
+                  "pros": "string",
+                  "cons": "string"
                 }}
-                """
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={ "type": "json_object" }
-                )
-                content = response.choices[0].message.content
-                data = json.loads(content)
-                suggestions = data.get('suggestions', [])
-                # If the AI didn't nest it under 'suggestions', but returned the list directly (unlikely with json_object mode but safe to check)
-                if not suggestions and isinstance(data, list):
-                    suggestions = data
-                return jsonify({"suggestions": suggestions})
+              ]
+            }}
+            """
+            content = ai.complete(prompt, json_mode=True, cache=True)
+            data = json.loads(content)
+            suggestions = data.get('suggestions', [])
+            # If the AI didn't nest it under 'suggestions', but returned the list directly (unlikely with json_object mode but safe to check)
+            if not suggestions and isinstance(data, list):
+                suggestions = data
+            return jsonify({"suggestions": suggestions})
+        except ai.CircuitOpenError:
+            pass
         except Exception as e:
-            print(f"AI Error: {e}")
+            current_app.logger.warning(f"AI option suggestions failed: {e}")
             # Fallback to simulation if AI fails
     
     # Simulation/Fallback
@@ -459,48 +555,31 @@ def refine_option(id):
     if not option_title:
         return jsonify({"error": "No title provided"}), 400
 
-    api_key = current_app.config.get('AI_API_KEY')
-    provider = current_app.config.get('AI_PROVIDER')
-    base_url = current_app.config.get('AI_BASE_URL')
-
-    if api_key:
+    if ai.is_configured():
         try:
-            if provider in ['openai', 'grok', 'groq']:
-                from openai import OpenAI
-                client = OpenAI(api_key=api_key, base_url=base_url)
-                
-                model = "gpt-3.5-turbo"
-                if provider == 'grok':
-                    model = "grok-2-1212"
-                elif provider == 'groq':
-                    model = "llama-3.3-70b-versatile"
-                
-                prompt = f"""
-                As an expert decision-making assistant, help me flesh out an option for the following decision.
-                
-                Decision Title: {decision.title}
-                
-                Option Title: {option_title}
-                
-                Please provide a detailed description, pros, and cons for this specific option, considering the context of the decision.
-                
-                IMPORTANT: You must respond ONLY with a JSON object in the following format:
-                {{
-                  "description": "string",
-                  "pros": "string",
-                  "cons": "string"
-                }}
-                """
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={ "type": "json_object" }
-                )
-                content = response.choices[0].message.content
-                suggestion = json.loads(content)
-                return jsonify(suggestion)
+            prompt = f"""
+            As an expert decision-making assistant, help me flesh out an option for the following decision.
+            
+            Decision Title: {decision.title}
+            
+            Option Title: {option_title}
+            
+            Please provide a detailed description, pros, and cons for this specific option, considering the context of the decision.
+            
+            IMPORTANT: You must respond ONLY with a JSON object in the following format:
+            {{
+              "description": "string",
+              "pros": "string",
+              "cons": "string"
+            }}
+            """
+            content = ai.complete(prompt, json_mode=True, cache=True)
+            suggestion = json.loads(content)
+            return jsonify(suggestion)
+        except ai.CircuitOpenError:
+            pass
         except Exception as e:
-            print(f"AI Error: {e}")
+            current_app.logger.warning(f"AI option refinement failed: {e}")
             
     # Fallback/Dummy response
     return jsonify({
@@ -574,16 +653,8 @@ def edit_decision(id):
         decision.is_public = form.is_public.data
         
         # Update stage content
-        decision.stage_1_trigger = form.stage_1_trigger.data
-        decision.stage_2_framing = form.stage_2_framing.data
-        decision.stage_3_objectives = form.stage_3_objectives.data
-        decision.stage_4_options = form.stage_4_options.data
-        decision.stage_5_information = form.stage_5_information.data
-        decision.stage_6_evaluation = form.stage_6_evaluation.data
-        decision.stage_7_emotions = form.stage_7_emotions.data
-        decision.stage_8_commitment = form.stage_8_commitment.data
-        decision.stage_9_execution = form.stage_9_execution.data
-        decision.stage_10_review = form.stage_10_review.data
+        for stage_key, _ in Decision.STAGES:
+            decision.set_stage_content(stage_key, extract_inline_images(form[f'stage_{stage_key}'].data))
         
         db.session.commit()
         flash('Decision updated!')
@@ -595,16 +666,8 @@ def edit_decision(id):
         form.is_public.data = decision.is_public
         
         # Populate stage content for editing
-        form.stage_1_trigger.data = decision.stage_1_trigger
-        form.stage_2_framing.data = decision.stage_2_framing
-        form.stage_3_objectives.data = decision.stage_3_objectives
-        form.stage_4_options.data = decision.stage_4_options
-        form.stage_5_information.data = decision.stage_5_information
-        form.stage_6_evaluation.data = decision.stage_6_evaluation
-        form.stage_7_emotions.data = decision.stage_7_emotions
-        form.stage_8_commitment.data = decision.stage_8_commitment
-        form.stage_9_execution.data = decision.stage_9_execution
-        form.stage_10_review.data = decision.stage_10_review
+        for stage_key, _ in Decision.STAGES:
+            form[f'stage_{stage_key}'].data = decision.get_stage_content(stage_key)
     return render_template('edit_decision.html', title='Edit Decision', 
                            form=form, decision=decision,
                            stage_details=Decision.STAGE_DETAILS)
@@ -631,22 +694,19 @@ def bulk_delete_decisions():
     if not current_user.is_admin:
         abort(403)
     
-    decision_ids = request.form.getlist('decision_ids')
+    decision_ids = request.form.getlist('decision_ids', type=int)
     if not decision_ids:
         flash('No decisions selected for deletion.')
         return redirect(url_for('main.admin'))
     
-    count = 0
-    for d_id in decision_ids:
-        decision = Decision.query.get(int(d_id))
-        if decision:
-            db.session.delete(decision)
-            count += 1
-    
+    counts = delete_decisions(decision_ids, current_app.config['BULK_DELETE_CHUNK_SIZE'])
+    count = counts['decision']
     if count > 0:
         db.session.commit()
-        flash(f'Successfully deleted {count} decisions.')
+        related = sum(counts.values()) - count
+        flash(f'Successfully deleted {count} decisions and {related} related records.')
     else:
+        db.session.rollback()
         flash('No decisions were deleted.')
         
     return redirect(url_for('main.admin'))
@@ -764,54 +824,36 @@ def apply_clarification(id):
     return redirect(url_for('main.view_decision', id=clarification.decision_id))
 
 @bp.route('/admin')
+@read_only
 @login_required
 def admin():
     if not current_user.is_admin:
         abort(403)
-    users = User.query.all()
-    decisions = Decision.query.all()
-    
-    # Calculate stats for each user
-    user_stats = {}
-    for user in users:
-        asked = UserAction.query.filter_by(user_id=user.id, action_type='asked').count()
-        read = UserAction.query.filter_by(user_id=user.id, action_type='read').count()
-        clarifications = UserAction.query.filter_by(user_id=user.id, action_type='clarification').count()
-        suggestions = UserAction.query.filter_by(user_id=user.id, action_type='suggestion').count()
-        
-        # High interaction questions: decisions owned by the user that have many interactions from others
-        # OR decisions the user interacted with that are popular? 
-        # The user asked: "how many questions had a lot of interaction"
-        # Let's count how many of THIS user's questions had > 3 interactions
-        high_interaction = 0
-        for d in user.decisions:
-            interaction_count = UserAction.query.filter(
-                UserAction.decision_id == d.id, 
-                UserAction.action_type.in_(['suggestion', 'clarification'])
-            ).count()
-            if interaction_count > 3: # Threshold for "a lot"
-                high_interaction += 1
-                
-        # Top 3 categories
-        top_categories = db.session.query(
-            Decision.category, db.func.count(UserAction.id).label('count')
-        ).join(UserAction, UserAction.decision_id == Decision.id
-        ).filter(UserAction.user_id == user.id
-        ).group_by(Decision.category
-        ).order_by(db.desc('count')
-        ).limit(3).all()
-
-        user_stats[user.id] = {
-            'asked': asked,
-            'read': read,
-            'clarifications': clarifications,
-            'suggestions': suggestions,
-            'high_interaction': high_interaction,
-            'top_categories': [cat for cat, count in top_categories if cat]
-        }
+    users = User.query.order_by(User.id).paginate(
+        page=request.args.get('page', 1, type=int),
+        per_page=current_app.config['ADMIN_USERS_PER_PAGE'], error_out=False)
+    decisions = decision_listing(Decision.query).order_by(Decision.id).paginate(
+        page=request.args.get('decisions_page', 1, type=int),
+        per_page=current_app.config['ADMIN_DECISIONS_PER_PAGE'], error_out=False)
+    
+    # Stats for the users on this page, from a handful of grouped queries
+    user_stats = admin_user_stats([user.id for user in users.items])
 
     return render_template('admin.html', title='Admin', users=users, decisions=decisions, user_stats=user_stats)
 
+@bp.route('/metrics')
+def prometheus_metrics():
+    if not metrics.enabled:
+        abort(404)
+    # Admins, or a scraper presenting METRICS_TOKEN
+    token = current_app.config.get('METRICS_TOKEN')
+    if not (token and compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')):
+        if not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        if not current_user.is_admin:
+            abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @bp.route('/admin/user/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def admin_edit_user(id):
@@ -865,33 +907,37 @@ def bulk_delete_users():
     if not current_user.is_admin:
         abort(403)
     
-    user_ids = request.form.getlist('user_ids')
+    user_ids = request.form.getlist('user_ids', type=int)
     if not user_ids:
         flash('No users selected for deletion.')
         return redirect(url_for('main.admin'))
     
-    count = 0
-    for u_id in user_ids:
-        u_id_int = int(u_id)
-        if u_id_int == current_user.id:
-            continue
-        user = User.query.get(u_id_int)
-        if user:
-            db.session.delete(user)
-            count += 1
-    
+    counts = delete_users([u_id for u_id in user_ids if u_id != current_user.id],
+                          current_app.config['BULK_DELETE_CHUNK_SIZE'])
+    count = counts['user']
     if count > 0:
         db.session.commit()
         flash(f'Successfully deleted {count} users.')
     else:
+        db.session.rollback()
         flash('No users were deleted (you cannot delete yourself via bulk delete).')
         
     return redirect(url_for('main.admin'))
 
 @bp.route('/user/<username>')
+@read_only
 def user(username):
     user = User.query.filter_by(username=username).first_or_404()
-    return render_template('user.html', user=user)
+    cursor = request.args.get('cursor')
+    decision_count, decisions_updated_at = decisions_changed_for_owner(user.id)
+    etag = make_etag('user', user.id, user.updated_at, decision_count, decisions_updated_at)
+
+    def render():
+        decisions, next_cursor = keyset_page(profile_feed_query(user, include_private=(user == current_user)),
+                                             cursor, current_app.config['DECISIONS_PER_PAGE'])
+        return render_template('user.html', user=user, decisions=decisions,
+                               cursor=cursor, next_cursor=next_cursor)
+    return conditional(etag, latest(user.updated_at, decisions_updated_at), render)
 
 @bp.route('/edit_profile', methods=['GET', 'POST'])
 @login_required
@@ -0,0 +1,207 @@
+import re
+from markupsafe import Markup
+from flask import current_app
+from werkzeug.local import LocalProxy
+from sqlalchemy import DDL, event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Decision, DecisionStageContent, Option, Suggestion
+from app.queries import decision_listing
+
+FTS_TABLE = 'decision_search'
+# bm25() weights for the title, stages and options columns
+FTS_WEIGHTS = (10.0, 2.0, 1.0)
+CREATE_FTS_TABLE = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5(title, stages, options, tokenize='porter unicode61', prefix='2 3')")
+
+fts_table = db.table(FTS_TABLE, db.column('rowid'), db.column('title'),
+                     db.column('stages'), db.column('options'))
+
+# db.create_all() doesn't know about the virtual table, so create it alongside
+event.listen(db.metadata, 'after_create', DDL(CREATE_FTS_TABLE).execute_if(dialect='sqlite'))
+
+# Which changes make a decision's search document stale
+INDEXED_FIELDS = {
+    Decision: ('title', 'stage_contents'),
+    DecisionStageContent: ('content',),
+    Option: ('title', 'description'),
+    Suggestion: ('title', 'description'),
+}
+REBUILD_CHUNK_SIZE = 500
+
+
+def search_terms(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def _plain_text(html):
+    return Markup(html or '').striptags()
+
+
+def build_documents(connection, decision_ids):
+    """Search text for each existing decision in decision_ids, keyed by id."""
+    documents = {
+        decision_id: {'title': title or '', 'stages': [], 'options': []}
+        for decision_id, title in connection.execute(
+            db.select(Decision.id, Decision.title).where(Decision.id.in_(decision_ids)))
+    }
+    if not documents:
+        return documents
+    ids = list(documents)
+    for decision_id, content in connection.execute(
+            db.select(DecisionStageContent.decision_id, DecisionStageContent.content)
+            .where(DecisionStageContent.decision_id.in_(ids))):
+        documents[decision_id]['stages'].append(_plain_text(content))
+    for model in (Option, Suggestion):
+        for decision_id, title, description in connection.execute(
+                db.select(model.decision_id, model.title, model.description)
+                .where(model.decision_id.in_(ids))):
+            documents[decision_id]['options'].extend([title or '', description or ''])
+    for document in documents.values():
+        document['stages'] = '\n'.join(document['stages'])
+        document['options'] = '\n'.join(document['options'])
+    return documents
+
+
+class FTS5Backend:
+    """SQLite FTS5 index with one row per decision (rowid = decision id)."""
+
+    name = 'fts5'
+    incremental = True
+
+    def update(self, connection, decision_ids):
+        decision_ids = list(decision_ids)
+        documents = build_documents(connection, decision_ids)
+        connection.execute(fts_table.delete().where(fts_table.c.rowid.in_(decision_ids)))
+        if documents:
+            connection.execute(fts_table.insert(), [
+                {'rowid': decision_id, **document} for decision_id, document in documents.items()
+            ])
+
+    def rebuild(self, connection):
+        connection.execute(db.text(CREATE_FTS_TABLE))
+        connection.execute(fts_table.delete())
+        last_id = 0
+        while True:
+            ids = connection.execute(
+                db.select(Decision.id).where(Decision.id > last_id)
+                .order_by(Decision.id).limit(REBUILD_CHUNK_SIZE)).scalars().all()
+            if not ids:
+                return
+            self.update(connection, ids)
+            last_id = ids[-1]
+
+    def search(self, query, terms):
+        # Every term must match; the last one also matches as a prefix while typing
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        index = db.literal_column(FTS_TABLE)
+        # Score the matches inside the index before joining the decisions
+        ranked = (db.select(fts_table.c.rowid.label('decision_id'),
+                            db.func.bm25(index, *FTS_WEIGHTS).label('rank'))
+                  .where(index.op('MATCH')(match))
+                  .subquery())
+        return (query.join(ranked, ranked.c.decision_id == Decision.id)
+                .order_by(ranked.c.rank, Decision.id.desc()))
+
+
+class LikeBackend:
+    """Index-free fallback for databases without FTS5: LIKE scans, title matches first."""
+
+    name = 'like'
+    incremental = False
+
+    def update(self, connection, decision_ids):
+        pass
+
+    def rebuild(self, connection):
+        pass
+
+    def search(self, query, terms):
+        title_match = db.and_(*[Decision.title.ilike(f'%{term}%') for term in terms])
+        for term in terms:
+            pattern = f'%{term}%'
+            query = query.filter(db.or_(
+                Decision.title.ilike(pattern),
+                Decision.stage_contents.any(DecisionStageContent.content.ilike(pattern)),
+                db.exists().where(Option.decision_id == Decision.id,
+                                  db.or_(Option.title.ilike(pattern), Option.description.ilike(pattern))),
+                db.exists().where(Suggestion.decision_id == Decision.id,
+                                  db.or_(Suggestion.title.ilike(pattern), Suggestion.description.ilike(pattern))),
+            ))
+        return query.order_by(db.case((title_match, 0), else_=1),
+                              Decision.created_at.desc(), Decision.id.desc())
+
+
+BACKENDS = {backend.name: backend for backend in (FTS5Backend, LikeBackend)}
+
+
+class SearchIndex:
+    """Full-text search over decisions, their stage content, options and suggestions.
+
+    SEARCH_BACKEND picks the implementation; 'auto' uses FTS5 on SQLite and
+    the LIKE fallback elsewhere. Incremental backends are updated from the
+    session in the same transaction as the write.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        name = app.config['SEARCH_BACKEND']
+        if name == 'auto':
+            name = 'fts5' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite') else 'like'
+        self.backend = BACKENDS[name]()
+        app.extensions['search'] = self
+
+    def search(self, query, text, page=1, per_page=24):
+        """Return one page of decisions from query matching text, best first,
+        and whether there is a next page."""
+        terms = search_terms(text)
+        if not terms:
+            return [], False
+        # Rank and page over ids only, then load the listing rows for that page
+        ids = [row.id for row in self.backend.search(query.with_entities(Decision.id), terms)
+               .offset((page - 1) * per_page).limit(per_page + 1)]
+        has_next = len(ids) > per_page
+        ids = ids[:per_page]
+        if not ids:
+            return [], has_next
+        decisions = {d.id: d for d in decision_listing(Decision.query).filter(Decision.id.in_(ids))}
+        return [decisions[decision_id] for decision_id in ids if decision_id in decisions], has_next
+
+    def rebuild(self):
+        with db.engine.begin() as connection:
+            self.backend.rebuild(connection)
+
+
+# The current app's SearchIndex; create_app gives every app its own
+search_index = LocalProxy(lambda: current_app.extensions['search'])
+
+
+def _stale_decision_ids(session):
+    ids = set()
+    for objects, check_history in ((session.new, False), (session.deleted, False), (session.dirty, True)):
+        for obj in objects:
+            fields = INDEXED_FIELDS.get(type(obj))
+            if fields is None:
+                continue
+            if check_history:
+                state = inspect(obj)
+                if not any(state.attrs[field].history.has_changes() for field in fields):
+                    continue
+            decision_id = obj.id if isinstance(obj, Decision) else obj.decision_id
+            if decision_id is not None:
+                ids.add(decision_id)
+    return ids
+
+
+@event.listens_for(Session, 'after_flush')
+def update_search_index(session, flush_context):
+    backend = search_index.backend
+    if backend is None or not backend.incremental:
+        return
+    ids = _stale_decision_ids(session)
+    if ids:
+        backend.update(session.connection(), ids)
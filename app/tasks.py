@@ -0,0 +1,121 @@
+import atexit
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.local import LocalProxy
+from app import db
+from app.resilience import CircuitOpenError
+from app.utils import request_category
+
+FALLBACK_CATEGORY = 'General'
+
+
+class Categorizer:
+    """Fills in Decision.category in a background thread pool so that saving a
+    decision never waits on the AI provider.
+
+    New decisions are saved with the fallback category and category_status
+    'pending'. The worker retries failed calls with jittered exponential
+    backoff, unless the AI circuit breaker is open, and sets category_status
+    to 'done' or 'failed' when it finishes, whatever goes wrong.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.run_async = app.config['CATEGORIZER_ASYNC']
+        self.workers = app.config['CATEGORIZER_WORKERS']
+        self.timeout = app.config['CATEGORIZE_TIMEOUT']
+        self.retries = app.config['CATEGORIZE_RETRIES']
+        self.backoff = app.config['CATEGORIZE_RETRY_BACKOFF']
+        app.extensions['categorizer'] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def submit(self, decision_id):
+        if not self.run_async:
+            self.run(decision_id)
+            return
+        self._get_executor().submit(self.run, decision_id)
+
+    def run(self, decision_id):
+        with self.app.app_context():
+            try:
+                self._categorize(decision_id)
+            except Exception:
+                # The executor would swallow this, leaving the decision pending
+                # and its page polling for a category that never comes
+                self.app.logger.exception(f"Categorizing decision {decision_id} failed")
+                db.session.rollback()
+                self._mark_failed(decision_id)
+
+    def _categorize(self, decision_id):
+        from app.models import Decision
+        decision = db.session.get(Decision, decision_id)
+        if decision is None or decision.category_status != 'pending':
+            return
+        title = decision.title
+        # Don't hold a connection open while waiting on the provider
+        db.session.rollback()
+
+        category, status = None, 'failed'
+        for attempt in range(self.retries + 1):
+            try:
+                # This loop does the retrying, with a longer backoff
+                category = request_category(title, deadline=self.timeout, retries=0)
+                status = 'done'
+                break
+            except CircuitOpenError:
+                break
+            except Exception as e:
+                self.app.logger.warning(
+                    f"AI categorization of decision {decision_id} failed (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+        decision = db.session.get(Decision, decision_id)
+        if decision is None:
+            return
+        decision.category = category or FALLBACK_CATEGORY
+        decision.category_status = status
+        db.session.commit()
+
+    def _mark_failed(self, decision_id):
+        from app.models import Decision
+        try:
+            decision = db.session.get(Decision, decision_id)
+            if decision is not None and decision.category_status == 'pending':
+                decision.category_status = 'failed'
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception(f"Could not mark the categorization of decision {decision_id} as failed")
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='categorizer')
+                self._pid = os.getpid()
+            return self._executor
+
+
+# The current app's Categorizer; create_app gives every app its own
+categorizer = LocalProxy(lambda: current_app.extensions['categorizer'])
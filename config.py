@@ -13,9 +13,81 @@ class Config:
     if not SQLALCHEMY_DATABASE_URI:
         SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replicas (see app/replicas.py): comma-separated URIs; read_only views read from them
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in (os.environ.get('SQLALCHEMY_REPLICA_URIS') or '').split(',') if uri.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS') or 5)
+    # Engine tuning (see app/engine.py). The SQLITE_* settings are applied as
+    # PRAGMAs on every connection; the DB_POOL_* ones to other backends' pools.
+    DB_TUNING_ENABLED = os.environ.get('DB_TUNING_ENABLED', 'true').lower() == 'true'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL' # safe with WAL
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000) # ms
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -64000) # negative = KiB
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     AI_API_KEY = os.environ.get('AI_API_KEY')
     AI_PROVIDER = os.environ.get('AI_PROVIDER') or 'openai' # default to openai
     AI_BASE_URL = os.environ.get('AI_BASE_URL')
+    AI_MODEL = os.environ.get('AI_MODEL') # overrides the provider's default model
+    # Shared, pooled AI client (see app/ai.py)
+    AI_TIMEOUT = float(os.environ.get('AI_TIMEOUT') or 60)
+    AI_MAX_CONNECTIONS = int(os.environ.get('AI_MAX_CONNECTIONS') or 20)
+    AI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('AI_MAX_KEEPALIVE_CONNECTIONS') or 10)
+    AI_KEEPALIVE_EXPIRY = 30.0
+    AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES') or 2)
+    # Deadlines, retries and circuit breaker for AI calls (see app/resilience.py).
+    # Deadlines are in seconds for all attempts together; keep them under the worker timeout.
+    AI_DEADLINE = float(os.environ.get('AI_DEADLINE') or 25)
+    AI_DEADLINES = {
+        'main.suggest_options': 8.0, # these two have rule-based fallbacks
+        'main.refine_option': 8.0,
+        'main.ai_assist_stage': 25.0,
+        'main.ai_assist_stage_stream': 25.0,
+    }
+    AI_RETRY_BACKOFF = 0.5 # seconds, doubled per retry, with full jitter
+    AI_RETRY_BACKOFF_MAX = 4.0
+    AI_MIN_ATTEMPT_TIME = 1.0 # don't retry with less time than this left
+    AI_BREAKER_THRESHOLD = int(os.environ.get('AI_BREAKER_THRESHOLD') or 5) # consecutive failures
+    AI_BREAKER_RESET_TIMEOUT = float(os.environ.get('AI_BREAKER_RESET_TIMEOUT') or 30)
+    # Cache for AI answers that only depend on their prompt (see app/cache.py)
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL') or 7 * 24 * 3600)
+    AI_CACHE_MAX_MEMORY_ENTRIES = int(os.environ.get('AI_CACHE_MAX_MEMORY_ENTRIES') or 1024)
+    AI_CACHE_MAX_DB_ENTRIES = int(os.environ.get('AI_CACHE_MAX_DB_ENTRIES') or 50000)
+    AI_CACHE_PRUNE_EVERY = 100
+    DECISIONS_PER_PAGE = int(os.environ.get('DECISIONS_PER_PAGE') or 24)
+    DECISIONS_FEED_MAX_PER_PAGE = 100
+    ADMIN_USERS_PER_PAGE = 50
+    ADMIN_DECISIONS_PER_PAGE = 50
+    CATEGORY_FACETS_TTL = int(os.environ.get('CATEGORY_FACETS_TTL') or 30) # seconds; see app/facets.py
+    BULK_DELETE_CHUNK_SIZE = 500 # ids per DELETE ... WHERE id IN (...)
+    # Cache for rendered page fragments (see app/fragments.py)
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND') or 'memory' # memory, redis, none
+    FRAGMENT_CACHE_URL = os.environ.get('FRAGMENT_CACHE_URL') or 'redis://localhost:6379/0'
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES') or 2048)
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL') or 24 * 3600)
+    # Per-request SQL, template and AI timings: Server-Timing header and /metrics (see app/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') # lets a scraper read /metrics without an admin login
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto' # auto, fts5, like
+    # Buffered writes for high-volume UserAction events (see app/events.py)
+    ACTION_BUFFER_ENABLED = os.environ.get('ACTION_BUFFER_ENABLED', 'true').lower() == 'true'
+    ACTION_BUFFER_MAX_SIZE = int(os.environ.get('ACTION_BUFFER_MAX_SIZE') or 10000)
+    ACTION_BUFFER_BATCH_SIZE = int(os.environ.get('ACTION_BUFFER_BATCH_SIZE') or 200)
+    ACTION_BUFFER_FLUSH_INTERVAL = float(os.environ.get('ACTION_BUFFER_FLUSH_INTERVAL') or 2.0)
+    ACTION_BUFFER_POLICY = os.environ.get('ACTION_BUFFER_POLICY') or 'drop' # drop, block
+    ACTION_BUFFER_BLOCK_TIMEOUT = 0.05
+    # Background AI categorization of new decisions (see app/tasks.py)
+    CATEGORIZER_ASYNC = os.environ.get('CATEGORIZER_ASYNC', 'true').lower() == 'true'
+    CATEGORIZER_WORKERS = int(os.environ.get('CATEGORIZER_WORKERS') or 2)
+    CATEGORIZE_TIMEOUT = float(os.environ.get('CATEGORIZE_TIMEOUT') or 15)
+    CATEGORIZE_RETRIES = int(os.environ.get('CATEGORIZE_RETRIES') or 2)
+    CATEGORIZE_RETRY_BACKOFF = 1.0
+    # Images pasted into stage content are stored here (see app/blobs.py); defaults to instance/blobs
+    BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH')
     WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
     WEBHOOK_REPO_PATH = os.environ.get('WEBHOOK_REPO_PATH') or basedir
@@ -0,0 +1,53 @@
+"""cascade deletes at the database level
+
+Revision ID: a1ad06ff0bea
+Revises: bb59d198ad6c
+Create Date: 2026-10-18 05:19:46.812164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1ad06ff0bea'
+down_revision = 'bb59d198ad6c'
+branch_labels = None
+depends_on = None
+
+# SQLite's foreign keys are unnamed; batch mode names them by this convention
+# so they can be dropped and recreated
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# table -> [(column, referred table, ON DELETE)], matching what the ORM
+# cascades do: a decision's children go with it, a user's content is kept
+FOREIGN_KEYS = {
+    'decision': [('user_id', 'user', 'SET NULL')],
+    'decision_stage_content': [('decision_id', 'decision', 'CASCADE')],
+    'option': [('decision_id', 'decision', 'CASCADE')],
+    'suggestion': [('user_id', 'user', 'SET NULL'), ('decision_id', 'decision', 'CASCADE')],
+    'clarification': [('user_id', 'user', 'SET NULL'), ('decision_id', 'decision', 'CASCADE')],
+    'stage_suggestion': [('user_id', 'user', 'SET NULL'), ('decision_id', 'decision', 'CASCADE')],
+    'user_action': [('user_id', 'user', 'SET NULL'), ('decision_id', 'decision', 'SET NULL')],
+    'user_activity_daily': [('user_id', 'user', 'CASCADE')],
+    'decision_activity_daily': [('decision_id', 'decision', 'CASCADE')],
+}
+
+
+def _replace_foreign_keys(ondelete_for):
+    inspector = sa.inspect(op.get_bind())
+    for table, foreign_keys in FOREIGN_KEYS.items():
+        existing = {tuple(fk['constrained_columns']): fk['name'] for fk in inspector.get_foreign_keys(table)}
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred, ondelete in foreign_keys:
+                name = f'fk_{table}_{column}_{referred}'
+                batch_op.drop_constraint(existing.get((column,)) or name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete_for(ondelete))
+
+
+def upgrade():
+    _replace_foreign_keys(lambda ondelete: ondelete)
+
+
+def downgrade():
+    _replace_foreign_keys(lambda ondelete: None)
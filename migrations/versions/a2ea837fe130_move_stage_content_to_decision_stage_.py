@@ -0,0 +1,70 @@
+"""move stage content to decision_stage_content
+
+Revision ID: a2ea837fe130
+Revises: c3e91d0a7b52
+Create Date: 2026-10-18 05:02:23.962190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2ea837fe130'
+down_revision = 'c3e91d0a7b52'
+branch_labels = None
+depends_on = None
+
+STAGE_KEYS = ['1_trigger', '2_framing', '3_objectives', '4_options', '5_information',
+              '6_evaluation', '7_emotions', '8_commitment', '9_execution', '10_review']
+
+stage_content = sa.table('decision_stage_content',
+                         sa.column('decision_id', sa.Integer),
+                         sa.column('stage_key', sa.String),
+                         sa.column('content', sa.Text))
+
+
+def _decision_table():
+    return sa.table('decision', sa.column('id', sa.Integer),
+                    *[sa.column(f'stage_{key}', sa.Text) for key in STAGE_KEYS])
+
+
+def upgrade():
+    op.create_table('decision_stage_content',
+    sa.Column('decision_id', sa.Integer(), nullable=False),
+    sa.Column('stage_key', sa.String(length=40), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['decision_id'], ['decision.id'], ),
+    sa.PrimaryKeyConstraint('decision_id', 'stage_key')
+    )
+
+    # Copy every non-empty stage body into its own row
+    decision = _decision_table()
+    for key in STAGE_KEYS:
+        column = decision.c[f'stage_{key}']
+        op.execute(stage_content.insert().from_select(
+            ['decision_id', 'stage_key', 'content'],
+            sa.select(decision.c.id, sa.literal(key), column)
+            .where(column.isnot(None), column != '')
+        ))
+
+    with op.batch_alter_table('decision', schema=None) as batch_op:
+        for key in STAGE_KEYS:
+            batch_op.drop_column(f'stage_{key}')
+
+
+def downgrade():
+    with op.batch_alter_table('decision', schema=None) as batch_op:
+        for key in STAGE_KEYS:
+            batch_op.add_column(sa.Column(f'stage_{key}', sa.TEXT(), nullable=True))
+
+    decision = _decision_table()
+    for key in STAGE_KEYS:
+        op.execute(decision.update().values({
+            f'stage_{key}': sa.select(stage_content.c.content)
+            .where(stage_content.c.decision_id == decision.c.id,
+                   stage_content.c.stage_key == key)
+            .scalar_subquery()
+        }))
+
+    op.drop_table('decision_stage_content')
@@ -0,0 +1,127 @@
+"""extract inline stage images into the blob store
+
+Revision ID: c3e91d0a7b52
+Revises: a1b6f338944d
+Create Date: 2026-10-18 05:20:41.118305
+
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e91d0a7b52'
+down_revision = 'a1b6f338944d'
+branch_labels = None
+depends_on = None
+
+STAGE_COLUMNS = ['stage_1_trigger', 'stage_2_framing', 'stage_3_objectives', 'stage_4_options',
+                 'stage_5_information', 'stage_6_evaluation', 'stage_7_emotions', 'stage_8_commitment',
+                 'stage_9_execution', 'stage_10_review']
+
+decision = sa.table('decision', sa.column('id', sa.Integer),
+                    *[sa.column(name, sa.Text) for name in STAGE_COLUMNS])
+stage_suggestion = sa.table('stage_suggestion', sa.column('id', sa.Integer), sa.column('content', sa.Text))
+
+# The blob store as it was at this revision: files named by the SHA-256 of
+# their bytes, under <root>/<digest[:2]>/<digest>.<ext>, served from /blobs/
+IMAGE_TYPES = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/webp': 'webp'}
+MIME_TYPES = {ext: mimetype for mimetype, ext in IMAGE_TYPES.items()}
+DATA_URI_RE = re.compile(
+    r'data:(?P<mimetype>image/(?:png|jpeg|gif|webp));base64,(?P<data>[A-Za-z0-9+/=\s]+)', re.IGNORECASE)
+BLOB_URL_RE = re.compile(r'/blobs/(?P<digest>[0-9a-f]{64})\.(?P<ext>png|jpg|gif|webp)')
+
+
+def _rewrite(table, columns, marker, convert):
+    # Only rows that contain the marker are read, one row at a time, so the
+    # large payloads are never all in memory at once
+    bind = op.get_bind()
+    matches = sa.or_(*[table.c[name].contains(marker) for name in columns])
+    ids = [row.id for row in bind.execute(sa.select(table.c.id).where(matches))]
+    for row_id in ids:
+        row = bind.execute(sa.select(*[table.c[name] for name in columns])
+                           .where(table.c.id == row_id)).mappings().one()
+        values = {}
+        for name in columns:
+            converted = convert(row[name])
+            if converted != row[name]:
+                values[name] = converted
+        if values:
+            bind.execute(table.update().where(table.c.id == row_id).values(**values))
+
+
+def _blob_root():
+    # Where the app keeps blobs, worked out here so that this doesn't depend
+    # on the app's extensions having been set up
+    if has_app_context():
+        root = current_app.config.get('BLOB_STORE_PATH') or os.path.join(current_app.instance_path, 'blobs')
+    else:
+        root = os.environ.get('BLOB_STORE_PATH')
+    if not root:
+        raise RuntimeError('This migration moves images into the blob store, but its location is unknown: '
+                           'run it with `flask db upgrade`, or set BLOB_STORE_PATH')
+    return root
+
+
+def _blob_path(root, digest, ext):
+    return os.path.join(root, digest[:2], f'{digest}.{ext}')
+
+
+def _put(root, data, ext):
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(root, digest, ext)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    return digest
+
+
+def _extractor(root):
+    def extract(html):
+        def replace(match):
+            try:
+                data = base64.b64decode(re.sub(r'\s+', '', match.group('data')), validate=True)
+            except (binascii.Error, ValueError):
+                return match.group(0)
+            ext = IMAGE_TYPES[match.group('mimetype').lower()]
+            return f'/blobs/{_put(root, data, ext)}.{ext}'
+        return DATA_URI_RE.sub(replace, html) if html else html
+    return extract
+
+
+def _inliner(root):
+    def inline(html):
+        def replace(match):
+            digest, ext = match.group('digest'), match.group('ext')
+            try:
+                with open(_blob_path(root, digest, ext), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return match.group(0)
+            return f'data:{MIME_TYPES[ext]};base64,{base64.b64encode(data).decode()}'
+        return BLOB_URL_RE.sub(replace, html) if html else html
+    return inline
+
+
+def upgrade():
+    extract = _extractor(_blob_root())
+    _rewrite(decision, STAGE_COLUMNS, 'base64,', extract)
+    _rewrite(stage_suggestion, ['content'], 'base64,', extract)
+
+
+def downgrade():
+    # Blob files are left in place; they are harmless once nothing references them
+    inline = _inliner(_blob_root())
+    _rewrite(decision, STAGE_COLUMNS, '/blobs/', inline)
+    _rewrite(stage_suggestion, ['content'], '/blobs/', inline)
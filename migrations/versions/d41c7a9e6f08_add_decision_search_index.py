@@ -0,0 +1,75 @@
+"""add decision search index
+
+Revision ID: d41c7a9e6f08
+Revises: a2ea837fe130
+Create Date: 2026-10-18 05:41:09.274113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from markupsafe import Markup
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41c7a9e6f08'
+down_revision = 'a2ea837fe130'
+branch_labels = None
+depends_on = None
+
+CHUNK_SIZE = 500
+
+decision = sa.table('decision', sa.column('id', sa.Integer), sa.column('title', sa.String))
+decision_stage_content = sa.table('decision_stage_content', sa.column('decision_id', sa.Integer),
+                                  sa.column('content', sa.Text))
+option = sa.table('option', sa.column('decision_id', sa.Integer), sa.column('title', sa.String),
+                  sa.column('description', sa.Text))
+suggestion = sa.table('suggestion', sa.column('decision_id', sa.Integer), sa.column('title', sa.String),
+                      sa.column('description', sa.Text))
+decision_search = sa.table('decision_search', sa.column('rowid', sa.Integer), sa.column('title', sa.Text),
+                           sa.column('stages', sa.Text), sa.column('options', sa.Text))
+
+
+def _index(bind, ids):
+    # One document per decision: its title, its stages as plain text, and
+    # the titles and descriptions of its options and suggestions
+    documents = {decision_id: {'rowid': decision_id, 'title': title or '', 'stages': [], 'options': []}
+                 for decision_id, title in bind.execute(
+                     sa.select(decision.c.id, decision.c.title).where(decision.c.id.in_(ids)))}
+    for decision_id, content in bind.execute(
+            sa.select(decision_stage_content.c.decision_id, decision_stage_content.c.content)
+            .where(decision_stage_content.c.decision_id.in_(ids))):
+        documents[decision_id]['stages'].append(Markup(content or '').striptags())
+    for table in (option, suggestion):
+        for decision_id, title, description in bind.execute(
+                sa.select(table.c.decision_id, table.c.title, table.c.description)
+                .where(table.c.decision_id.in_(ids))):
+            documents[decision_id]['options'].extend([title or '', description or ''])
+    for document in documents.values():
+        document['stages'] = '\n'.join(document['stages'])
+        document['options'] = '\n'.join(document['options'])
+    if documents:
+        bind.execute(decision_search.insert(), list(documents.values()))
+
+
+def upgrade():
+    # Only SQLite gets the FTS5 index; other databases use the LIKE backend
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS decision_search "
+               "USING fts5(title, stages, options, tokenize='porter unicode61', prefix='2 3')")
+    op.execute('DELETE FROM decision_search')
+    last_id = 0
+    while True:
+        ids = bind.execute(sa.select(decision.c.id).where(decision.c.id > last_id)
+                           .order_by(decision.c.id).limit(CHUNK_SIZE)).scalars().all()
+        if not ids:
+            return
+        _index(bind, ids)
+        last_id = ids[-1]
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TABLE IF EXISTS decision_search')
@@ -26,17 +26,13 @@ def test_config():
         print(f"[✓] AI_BASE_URL set to: {base_url}")
     print(f"[✓] AI_API_KEY found: {api_key[:5]}...{api_key[-4:] if len(api_key) > 4 else ''}")
 
-    if provider in ['openai', 'grok', 'groq']:
+    from app.ai import PROVIDERS, create_client
+
+    if provider in PROVIDERS:
         try:
-            from openai import OpenAI
             print(f"[...] Connecting to {provider.upper()}...")
-            client = OpenAI(api_key=api_key, base_url=base_url)
-            
-            model = "gpt-3.5-turbo"
-            if provider == 'grok':
-                model = "grok-2-1212"
-            elif provider == 'groq':
-                model = "llama-3.3-70b-versatile"
+            client = create_client(api_key, base_url)
+            model = os.getenv('AI_MODEL') or PROVIDERS[provider]['model']
 
             # Simple test call
             response = client.chat.completions.create(
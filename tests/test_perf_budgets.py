@@ -0,0 +1,29 @@
+import os
+import pytest
+from app.budgets import CASES, run_budgets
+
+SIZES = (200, 2000)
+# Time budgets depend on the machine, so they are only checked here when
+# asked for; `flask perf budget` always checks them
+CHECK_TIMES = os.environ.get('PERF_BUDGET_CHECK_TIMES', 'false').lower() == 'true'
+TIME_FACTOR = float(os.environ.get('PERF_BUDGET_TIME_FACTOR') or 1.0)
+
+
+@pytest.fixture(scope='module')
+def report():
+    return run_budgets(sizes=SIZES, repeat=3 if CHECK_TIMES else 1, time_factor=TIME_FACTOR)
+
+
+def test_every_route_has_a_budget(report):
+    assert report['unbudgeted_endpoints'] == []
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('index', range(len(CASES)),
+                         ids=[f'{case.method} {case.endpoint} as {case.viewer}' for case in CASES])
+def test_within_budget(report, size, index):
+    result = [result for result in report['results'] if result['size'] == size][index]
+    assert result['status'] == CASES[index].status
+    assert result['queries'] <= result['query_budget']
+    if CHECK_TIMES:
+        assert result['ms'] <= result['ms_budget']
@@ -0,0 +1,51 @@
+import pytest
+from flask import has_request_context
+from sqlalchemy import event
+from app import db
+from app.budgets import scratch_app
+from app.loadtest import seed_dataset
+from app.models import User
+
+N = 100
+PAGES = ['/index', '/admin', '/user/load_0']
+
+
+def query_counts(directory, decisions):
+    # The statements each page makes for load_0, who owns most decisions
+    # and is an admin, on a database seeded with this many decisions. Users
+    # grow with them, so that a page lists more distinct owners too.
+    counts = {}
+    with scratch_app(directory) as app:
+        with app.app_context():
+            seed_dataset(users=decisions // 5, decisions=decisions, actions=decisions * 5, images=0)
+            user_id = db.session.scalar(db.select(User.id).where(User.username == 'load_0'))
+            engine = db.engine
+        counter = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context():
+                counter.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+            for path in PAGES:
+                counter.clear()
+                assert client.get(path).status_code == 200
+                counts[path] = len(counter)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+    return counts
+
+
+@pytest.fixture(scope='module')
+def counts(tmp_path_factory):
+    return {decisions: query_counts(str(tmp_path_factory.mktemp(f'queries-{decisions}')), decisions)
+            for decisions in (N, 10 * N)}
+
+
+@pytest.mark.parametrize('path', PAGES)
+def test_query_count_does_not_grow_with_decisions(counts, path):
+    assert counts[N][path] == counts[10 * N][path]
@@ -0,0 +1,13 @@
+from app.budgets import scratch_app
+from app.loadtest import seed_dataset
+from app.perf import explain_hot_paths
+
+
+def test_hot_queries_avoid_full_table_scans(tmp_path):
+    with scratch_app(str(tmp_path)) as app, app.app_context():
+        seed_dataset(users=20, decisions=200, actions=2000, images=0)
+        results = explain_hot_paths()
+    assert results
+    failures = {result['name']: [query['full_scans'] for query in result['queries']]
+                for result in results if not result['ok']}
+    assert not failures